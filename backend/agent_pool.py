@@ -0,0 +1,351 @@
+"""
+Agent Pool
+----------
+Bounded thread pool that sends agent prompts to the LLM backends concurrently,
+so a ticket takes as long as its slowest agent rather than the sum of all of them.
+Async agent functions run on a shared event loop instead of holding a thread.
+Every call is timed and recorded in the agent metrics under its agent name.
+Calls carry the deadline of the request that made them: waiting for a result
+stops at the deadline, and calls that miss it are answered with {"timedOut": true}.
+Agents that depend on each other run as a graph: each starts as soon as the
+agents it depends on have answered, with their answers in its prompt.
+"""
+
+import time
+import queue
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+from deadline import current as current_deadline, deadline_scope, expired, remaining, timed_out
+from metrics import CallRecord, active_collector, call_context
+
+class FairSemaphore:
+    """Semaphore that admits waiting threads in arrival order
+
+    A released slot is handed straight to the oldest waiter. With threading's
+    semaphore the releasing worker could take the slot back for its next task
+    first, and under sustained load one ticket's agent could wait for seconds.
+    """
+
+    def __init__(self, value):
+        self._value = value
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return
+            waiter = threading.Lock()
+            waiter.acquire()
+            self._waiters.append(waiter)
+        waiter.acquire()  # released by the release() that hands over its slot
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().release()
+            else:
+                self._value += 1
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class AgentPool:
+    def __init__(self, max_workers, backend_limits):
+        """Create the worker pool and one concurrency limit per backend"""
+        self.max_workers = max_workers
+        self.backend_limits = dict(backend_limits)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+        self._semaphores = {
+            backend: FairSemaphore(limit)
+            for backend, limit in self.backend_limits.items()
+        }
+        self._loop = None
+        self._async_semaphores = {}
+        self._loop_lock = threading.Lock()
+
+    def submit(self, backend, agent_fn, prompt, agent="agent"):
+        """Schedule a single agent call and return its future; agent names it in the metrics"""
+        record = CallRecord(agent, backend)
+        collector = active_collector()
+        if collector is not None:
+            collector.append(record)
+        submitted = record.submitted = time.perf_counter()
+        deadline = current_deadline()
+        if asyncio.iscoroutinefunction(agent_fn):
+            future = asyncio.run_coroutine_threadsafe(
+                self._call_async(record, submitted, deadline, agent_fn, prompt), self._event_loop()
+            )
+        else:
+            future = self._executor.submit(self._call, record, submitted, deadline, agent_fn, prompt)
+        future.call_record = record
+        return future
+
+    def call(self, backend, agent_fn, prompt, agent="agent"):
+        """Run a single agent call through the pool and wait for its result"""
+        return self.result(self.submit(backend, agent_fn, prompt, agent))
+
+    def run_all(self, backend, agent_fn, prompts):
+        """Send every prompt at once and collect the results under the same keys"""
+        futures = {name: self.submit(backend, agent_fn, prompt, name) for name, prompt in prompts.items()}
+        return {name: self.result(future) for name, future in futures.items()}
+
+    def run_graph(self, backend, agent_fn, names, dependencies, prompt_for):
+        """Run the named agents in dependency order and collect their results by name
+
+        Agents whose dependencies are done (or not among names) run concurrently;
+        prompt_for(name, upstream) builds each prompt from the upstream results.
+        Agents that have not answered by the deadline are reported as timed out.
+        """
+        results = {}
+        answers = queue.Queue()
+        stop = self.start_graph(
+            backend, lambda name: agent_fn, names, dependencies, prompt_for,
+            lambda name, result: answers.put((name, result))
+        )
+        try:
+            while len(results) < len(names):
+                left = remaining()
+                try:
+                    name, result = answers.get(timeout=None if left is None else max(left, 0))
+                except queue.Empty:
+                    break
+                results[name] = result
+        finally:
+            stop(deadline_passed=len(results) < len(names))
+        return {name: results.get(name, timed_out()) for name in names}
+
+    def start_graph(self, backend, agent_for, names, dependencies, prompt_for, on_result):
+        """Start the agents of run_graph without waiting; on_result(name, result) is called as each answers
+
+        agent_for(name) gives the agent function of each agent. Returns a function
+        that stops the graph: queued calls are cancelled and nothing more is started.
+        Called with deadline_passed=True, it records the unanswered agents, including
+        those never started, as timed out.
+        """
+        names = list(names)
+        waiting_on = {name: {upstream for upstream in dependencies.get(name, ()) if upstream in names}
+                      for name in names}
+        results = {}
+        futures = {}  # name -> future, for the agents launched so far
+        lock = threading.Lock()
+        stopped = False
+        started = time.perf_counter()
+        collector = active_collector()
+        # Dependents are submitted from worker threads; they keep the deadline and metrics collector of the caller
+        context = contextvars.copy_context()
+
+        def launch(name):
+            upstream = {dependency: results[dependency] for dependency in dependencies.get(name, ())
+                        if dependency in results}
+            prompt = prompt_for(name, upstream)
+            with lock:
+                if stopped:
+                    return
+                future = context.copy().run(self.submit, backend, agent_for(name), prompt, name)
+                futures[name] = future
+            future.add_done_callback(lambda future: answered(name, future))
+
+        def answered(name, future):
+            result = self.result(future)
+            ready = []
+            with lock:
+                if stopped:
+                    return
+                results[name] = result
+                for other, upstream in list(waiting_on.items()):
+                    upstream.discard(name)
+                    if not upstream:
+                        ready.append(other)
+                        del waiting_on[other]
+            on_result(name, result)
+            for other in ready:
+                launch(other)
+
+        def stop(deadline_passed=False):
+            nonlocal stopped
+            with lock:
+                stopped = True
+                pending = [future for future in futures.values() if not future.done()]
+                never_started = [name for name in names if name not in futures]
+            for future in pending:
+                if deadline_passed:
+                    self._give_up(future)
+                else:
+                    future.cancel()
+            if deadline_passed:
+                for name in never_started:
+                    record = CallRecord(name, backend)
+                    record.timed_out = True
+                    record.queue_seconds = time.perf_counter() - started
+                    if collector is not None:
+                        collector.append(record)
+                    record.observe()
+
+        roots = [name for name, upstream in waiting_on.items() if not upstream]
+        for name in roots:
+            del waiting_on[name]
+        for name in roots:
+            launch(name)
+        return stop
+
+    def run_batch(self, backend, agent_fn, jobs, max_in_flight):
+        """Run the prompts of many tickets through the pool, yielding (key, results) per ticket
+
+        jobs is an iterable of (key, prompts) pairs. It is consumed lazily, so at most
+        max_in_flight tickets are scheduled at once, and each ticket is yielded as soon
+        as its last agent finishes, regardless of submission order.
+        """
+        jobs = iter(jobs)
+        pending = {}  # future -> (ticket key, agent name)
+        in_flight = {}  # ticket key -> [agents still running, results]
+        ready = []
+
+        def schedule():
+            while len(in_flight) < max_in_flight:
+                job = next(jobs, None)
+                if job is None:
+                    return
+                key, prompts = job
+                if not prompts:
+                    ready.append((key, {}))
+                    continue
+                in_flight[key] = [len(prompts), dict.fromkeys(prompts)]
+                for name, prompt in prompts.items():
+                    pending[self.submit(backend, agent_fn, prompt, name)] = (key, name)
+
+        try:
+            schedule()
+            while pending or ready:
+                while ready:
+                    yield ready.pop(0)
+                if not pending:
+                    schedule()
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, name = pending.pop(future)
+                    entry = in_flight[key]
+                    entry[1][name] = self.result(future)
+                    entry[0] -= 1
+                    if entry[0] == 0:
+                        del in_flight[key]
+                        ready.append((key, entry[1]))
+                schedule()
+        finally:
+            # The consumer went away (e.g. the client disconnected): drop queued calls
+            for future in pending:
+                future.cancel()
+
+    def result(self, future):
+        """Unwrap a future, turning an unexpected exception into an error result
+
+        Waits no longer than the current deadline; a call still queued then is
+        cancelled, and one already running is left to stop at its own timeout.
+        """
+        try:
+            return future.result(timeout=remaining())
+        except FutureTimeout:
+            self._give_up(future)
+            return timed_out()
+        except Exception as e:
+            return {"error": str(e)}
+
+    def _event_loop(self):
+        # Started on first use, so pools that only run sync agents never spawn it
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="agent-loop", daemon=True).start()
+            return self._loop
+
+    async def _call_async(self, record, submitted, deadline, agent_fn, prompt):
+        limit = self.backend_limits.get(record.backend)
+        if limit is None:
+            return await self._timed_async(record, submitted, deadline, agent_fn, prompt)
+        semaphore = self._async_semaphores.get(record.backend)
+        if semaphore is None:
+            semaphore = self._async_semaphores[record.backend] = asyncio.Semaphore(limit)
+        async with semaphore:
+            return await self._timed_async(record, submitted, deadline, agent_fn, prompt)
+
+    async def _timed_async(self, record, submitted, deadline, agent_fn, prompt):
+        started = self._start(record, submitted)
+        result = None
+        try:
+            with deadline_scope(deadline), call_context(record):
+                if expired():
+                    result = timed_out()
+                else:
+                    try:
+                        # The coroutine itself is cancelled at the deadline
+                        result = self._settle(await asyncio.wait_for(agent_fn(prompt), remaining()))
+                    except asyncio.TimeoutError:
+                        result = timed_out()
+            return result
+        finally:
+            self._finish(record, started, result)
+
+    def _call(self, record, submitted, deadline, agent_fn, prompt):
+        semaphore = self._semaphores.get(record.backend)
+        if semaphore is None:
+            return self._timed(record, submitted, deadline, agent_fn, prompt)
+        with semaphore:
+            return self._timed(record, submitted, deadline, agent_fn, prompt)
+
+    def _timed(self, record, submitted, deadline, agent_fn, prompt):
+        started = self._start(record, submitted)
+        result = None
+        try:
+            with deadline_scope(deadline), call_context(record):
+                # Nothing is started once the deadline has passed, e.g. after queueing for a slot
+                result = timed_out() if expired() else self._settle(agent_fn(prompt))
+            return result
+        finally:
+            self._finish(record, started, result)
+
+    @staticmethod
+    def _give_up(future):
+        """Cancel a call that missed the deadline and record it as timed out now, not when it ends"""
+        future.cancel()
+        record = future.call_record
+        now = time.perf_counter()
+        record.timed_out = True
+        if record.started is None:
+            # No worker will finish the record of a call that never started
+            record.queue_seconds = now - record.submitted
+            record.observe()
+        else:
+            record.wall_seconds = now - record.started
+
+    @staticmethod
+    def _settle(result):
+        # Agent functions report a client timeout like any other error; past the deadline it is a timeout
+        if isinstance(result, dict) and "error" in result and expired():
+            return timed_out()
+        return result
+
+    @staticmethod
+    def _start(record, submitted):
+        started = record.started = time.perf_counter()
+        record.queue_seconds = started - submitted
+        return started
+
+    @staticmethod
+    def _finish(record, started, result):
+        if record.observed:
+            return  # given up on before it started, and already counted
+        record.wall_seconds = time.perf_counter() - started
+        given_up = record.timed_out  # the caller stopped waiting at the deadline
+        # No result means the agent function raised (or, given up on, was cancelled)
+        record.error = not given_up and (result is None or (isinstance(result, dict) and "error" in result))
+        record.timed_out = given_up or (isinstance(result, dict) and result.get("timedOut", False))
+        record.observe()
@@ -0,0 +1,153 @@
+"""
+Agent Prompts
+-------------
+Instructions for the specialized agents run against every ticket by /process-ticket.
+Every agent's prompt starts with the same ticket and historical context block and
+ends with its own instructions, so the model server can reuse the evaluated
+prefix across the agents of a ticket instead of evaluating it six times.
+Agents that build on another agent's answer get it between the shared prefix
+and their instructions, when that agent runs for the same request.
+"""
+
+import os
+import json
+from context_builder import condense, estimate_tokens
+
+# Tokens per agent prompt, kept under the model's context window so the shared prefix is never cut
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "1536"))
+
+# Ordered so results come back in the same order the agents have always run in
+AGENT_INSTRUCTIONS = {
+    "summary": (
+        "Summarizer",
+        """You are a customer support AI that accurately summarizes tickets. Analyze this support ticket and provide:
+1. A concise summary (3-4 sentences)
+2. 3-5 key points
+3. Customer sentiment (positive, neutral, or negative)""",
+    ),
+    "actions": (
+        "Action Extractor",
+        """You are a customer support expert who identifies required actions. Analyze this support ticket and extract required actions:
+Identify 2-4 specific actions that should be taken to resolve this ticket.
+Each action should have:
+1. A type (investigation, customer contact, technical fix, escalation, etc.)
+2. A priority (low, medium, high)
+3. A clear description of what needs to be done""",
+    ),
+    "routing": (
+        "Team Router",
+        """You are a ticket routing specialist. Analyze this support ticket and determine which team it should be routed to:
+Choose the most appropriate team and explain your reasoning.
+Potential teams: technical-support, billing, account-management, product-feedback, security, legal""",
+    ),
+    "sentiment": (
+        "Sentiment Analyzer",
+        """You are a sentiment analysis specialist who can detect emotions and tone in text. Perform a detailed sentiment analysis of this customer support ticket:
+Analyze the customer's emotions, tone, and attitude in the message.
+Be specific about the different emotions detected and their intensity.""",
+    ),
+    "recommendations": (
+        "Resolution Recommender",
+        """You are a support resolution specialist with access to historical cases. Based on this support ticket and historical data, recommend potential resolutions:
+Provide 1-3 suggested resolutions with clear steps.""",
+    ),
+    "timeEstimation": (
+        "Time Estimator",
+        """You are a support resolution time estimator. Estimate how long it will take to resolve this support ticket:
+Estimate the resolution time in minutes and explain the factors that influenced your estimate.""",
+    ),
+}
+
+# Agent -> agents whose answers it is shown. Soft: an upstream agent that was not
+# requested is not run for it, and one that fails only leaves its answer out
+AGENT_DEPENDENCIES = {
+    "timeEstimation": ("routing",),
+    "recommendations": ("actions",),
+}
+
+RESPONSE_FORMAT = "Format your response as valid JSON."
+
+# Room the longest instructions take at the end of a prompt
+INSTRUCTION_TOKENS = max(
+    estimate_tokens(f"{instructions}\n\n{RESPONSE_FORMAT}") for _, instructions in AGENT_INSTRUCTIONS.values()
+)
+# Room for each upstream answer; longer ones are condensed
+UPSTREAM_TOKENS = 256
+UPSTREAM_RESERVE = UPSTREAM_TOKENS * max(len(upstream) for upstream in AGENT_DEPENDENCIES.values())
+
+
+def ticket_block(ticket_info, instruction_tokens=INSTRUCTION_TOKENS):
+    """Ticket part of the shared prefix; very long descriptions are condensed to leave room for instructions"""
+    description = condense(ticket_info['description'], max(PROMPT_TOKEN_BUDGET - instruction_tokens, 0) // 2)
+    return f"""Ticket: {ticket_info['subject']}
+Description: {description}
+"""
+
+
+def context_budget(ticket_info, instruction_tokens=None):
+    """Tokens left for the historical context once the ticket, upstream answers and instructions are in the prompt
+
+    instruction_tokens is the room a prompt needs after the context, when it is
+    not one agent's instructions and upstream answers (as for a fused prompt).
+    """
+    if instruction_tokens is None:
+        reserved = INSTRUCTION_TOKENS + UPSTREAM_RESERVE + estimate_tokens(ticket_block(ticket_info))
+    else:
+        reserved = instruction_tokens + estimate_tokens(ticket_block(ticket_info, instruction_tokens))
+    return max(PROMPT_TOKEN_BUDGET - reserved - 8, 0)
+
+
+def shared_prefix(ticket_info, historical_context, instruction_tokens=INSTRUCTION_TOKENS):
+    """Start of every agent's prompt for a ticket; instruction_tokens as for context_budget"""
+    prefix = ticket_block(ticket_info, instruction_tokens)
+    if historical_context:
+        prefix += f"\nHistorical Context:\n{historical_context}\n"
+    return prefix
+
+
+def upstream_block(upstream):
+    """Answers of upstream agents that succeeded, for a downstream agent's prompt"""
+    block = ""
+    for name, result in upstream.items():
+        if not isinstance(result, dict) or "error" in result or result.get("timedOut"):
+            continue
+        role = AGENT_INSTRUCTIONS[name][0]
+        block += f"\n{role} output:\n{condense(json.dumps(result), UPSTREAM_TOKENS)}\n"
+    return block
+
+
+def create_agent_prompt(instructions, prefix, upstream=None):
+    return f"""{prefix}{upstream_block(upstream or {})}
+{instructions}
+
+{RESPONSE_FORMAT}"""
+
+
+def build_agent_prompt(name, prefix, upstream=None):
+    """Prompt of one agent, given the upstream answers available to it"""
+    return create_agent_prompt(AGENT_INSTRUCTIONS[name][1], prefix, upstream)
+
+
+def select_agents(requested=None):
+    """Agent names in run order for an "agents" request field; all of them when it is absent
+
+    Raises ValueError for anything but a non-empty list of known agent names.
+    """
+    if requested is None:
+        return list(AGENT_INSTRUCTIONS)
+    if not isinstance(requested, list) or not requested:
+        raise ValueError("agents must be a non-empty list of agent names")
+    unknown = [name for name in requested if not isinstance(name, str) or name not in AGENT_INSTRUCTIONS]
+    if unknown:
+        raise ValueError(f"Unknown agents: {', '.join(map(str, unknown))}; "
+                         f"choose from {', '.join(AGENT_INSTRUCTIONS)}")
+    return [name for name in AGENT_INSTRUCTIONS if name in requested]
+
+
+def build_agent_prompts(ticket, historical_context, agents=None):
+    """Build the prompt of every agent (or of the agents named), keyed by the result field it fills
+
+    These prompts carry no upstream answers; run_graph callers use build_agent_prompt.
+    """
+    prefix = shared_prefix(ticket, historical_context)
+    return {name: build_agent_prompt(name, prefix) for name in (agents or AGENT_INSTRUCTIONS)}
@@ -8,8 +8,12 @@ a detailed breakdown of customer emotions and overall tone.
 
 import re
 import json
+from bisect import bisect_right
 from typing import Dict, Any, List, Tuple
 
+_WORD_CHAR = re.compile(r'\w')
+_SENTENCE = re.compile(r'[^.!?]+')
+
 class SentimentAnalyzerAgent:
     """Agent that analyzes sentiment and emotions in customer support tickets."""
     
@@ -31,23 +35,55 @@ class SentimentAnalyzerAgent:
             "negative": ["bad", "terrible", "awful", "horrible", "useless", "problem", "issue", "error", "bug", "glitch", "doesn't work", "failed", "failure", "poor", "disappointed", "waste", "broken", "crash", "not working"],
             "neutral": ["how", "what", "when", "where", "who", "which", "question", "information", "help", "assist", "details", "instructions", "guidance", "explain", "tell", "show"]
         }
+
+        # One alternation over every keyword, longest first, inside a lookahead so
+        # overlapping occurrences ("help" inside "helpful") are all found in one pass.
+        keywords = {
+            keyword
+            for groups in (self.emotion_keywords, self.sentiment_indicators)
+            for words in groups.values()
+            for keyword in words
+        }
+        ordered = sorted(keywords, key=lambda k: (-len(k), k))
+        self._matcher = re.compile('(?=(' + '|'.join(re.escape(k) for k in ordered) + '))')
+        # Keywords matching at the same position are all prefixes of the longest
+        # one, so each match expands to every keyword that starts there.
+        self._prefixes = {
+            keyword: [other for other in ordered if keyword.startswith(other)]
+            for keyword in ordered
+        }
     
     def analyze_ticket(self, ticket: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze a ticket's subject and description for sentiment and emotions."""
+        return self._analyze(ticket)[0]
+    
+    def analyze_with_confidence(self, ticket: Dict[str, Any]) -> Dict[str, Any]:
+        """Analyze a ticket and attach a 0-1 confidence in the overall sentiment."""
+        analysis, evidence = self._analyze(ticket)
+        analysis["confidence"] = self._calculate_confidence(analysis["sentiment_scores"], evidence)
+        return analysis
+    
+    def _analyze(self, ticket: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """Run the analysis, also returning how many sentiment keywords backed it."""
         text = f"{ticket['subject']} {ticket['description']}".lower()
         
+        # Find every keyword occurrence in a single pass
+        word_counts, present, sentences = self._scan(text)
+        
         # Detect emotions
-        emotions = self._detect_emotions(text)
+        emotions = self._detect_emotions(word_counts)
         
         # Determine overall sentiment
-        sentiment_scores = self._calculate_sentiment(text)
+        sentiment_scores = self._calculate_sentiment(present)
         primary_sentiment = max(sentiment_scores.items(), key=lambda x: x[1])[0]
         
         # Generate intensity score (0-1)
         intensity = self._calculate_intensity(emotions, text)
         
         # Analyze key phrases that indicate the sentiment
-        key_phrases = self._extract_sentiment_phrases(text, primary_sentiment)
+        key_phrases = self._extract_sentiment_phrases(sentences, primary_sentiment)
+        
+        evidence = sum(1 for words in self.sentiment_indicators.values() for k in words if k in present)
         
         return {
             "overall_sentiment": primary_sentiment,
@@ -56,20 +92,55 @@ class SentimentAnalyzerAgent:
             "intensity": intensity,
             "key_phrases": key_phrases,
             "summary": self._generate_summary(primary_sentiment, emotions, intensity)
-        }
+        }, evidence
+    
+    def _scan(self, text: str) -> Tuple[Dict[str, int], set, List[Tuple[str, Dict[str, int]]]]:
+        """Match every keyword against the text in one pass.
+        
+        Returns whole-word occurrence counts, the set of keywords found anywhere
+        (substring semantics), and each non-empty sentence with the offset of the
+        first occurrence of every keyword inside it.
+        """
+        spans = [(m.start(), m.group()) for m in _SENTENCE.finditer(text)]
+        starts = [start for start, _ in spans]
+        first_positions = [{} for _ in spans]
+        word_counts = {}
+        present = set()
+        
+        for match in self._matcher.finditer(text):
+            start = match.start()
+            piece = bisect_right(starts, start) - 1
+            for keyword in self._prefixes[match.group(1)]:
+                present.add(keyword)
+                first_positions[piece].setdefault(keyword, start)
+                end = start + len(keyword)
+                # Whole words only, as \b...\b would match
+                if (start == 0 or not _WORD_CHAR.match(text[start - 1])) and \
+                        (end == len(text) or not _WORD_CHAR.match(text[end])):
+                    word_counts[keyword] = word_counts.get(keyword, 0) + 1
+        
+        sentences = []
+        for (start, piece), positions in zip(spans, first_positions):
+            sentence = piece.strip()
+            if not sentence:
+                continue
+            offset = start + len(piece) - len(piece.lstrip())
+            sentences.append((sentence, {k: pos - offset for k, pos in positions.items()}))
+        
+        return word_counts, present, sentences
     
-    def _detect_emotions(self, text: str) -> Dict[str, float]:
+    def _detect_emotions(self, word_counts: Dict[str, int]) -> Dict[str, float]:
         """Detect emotions present in the text with scores."""
         emotions = {}
         
         for emotion, keywords in self.emotion_keywords.items():
             score = 0
             for keyword in keywords:
-                # Look for whole words only
-                matches = re.findall(r'\b' + keyword + r'\b', text)
+                # Whole word occurrences only
+                matches = word_counts.get(keyword, 0)
                 if matches:
                     # Weight increases with multiple occurrences
-                    score += len(matches) * 0.2
+                    score += matches * 0.2
             
             if score > 0:
                 emotions[emotion] = min(1.0, score)  # Cap at 1.0
@@ -83,13 +154,13 @@ class SentimentAnalyzerAgent:
                 
         return emotions
     
-    def _calculate_sentiment(self, text: str) -> Dict[str, float]:
+    def _calculate_sentiment(self, present: set) -> Dict[str, float]:
         """Calculate sentiment scores (positive, negative, neutral)."""
         scores = {"positive": 0.0, "negative": 0.0, "neutral": 0.0}
         
         for sentiment, keywords in self.sentiment_indicators.items():
             for keyword in keywords:
-                if keyword in text:
+                if keyword in present:
                     scores[sentiment] += 0.1
         
         # Normalize
@@ -103,6 +174,20 @@ class SentimentAnalyzerAgent:
             
         return scores
     
+    def _calculate_confidence(self, scores: Dict[str, float], evidence: int) -> float:
+        """Estimate how far the overall sentiment can be trusted (0-1)."""
+        # Nothing matched, or the neutral default kicked in: the scores are a guess
+        if evidence == 0 or abs(sum(scores.values()) - 1.0) > 1e-9:
+            return 0.0
+        
+        # How clearly the winning sentiment beats the runner-up...
+        ranked = sorted(scores.values(), reverse=True)
+        margin = ranked[0] - ranked[1]
+        
+        # ...discounted when it rests on only one or two keywords
+        support = min(1.0, evidence / 3)
+        return round(margin * (0.5 + 0.5 * support), 3)
+    
     def _calculate_intensity(self, emotions: Dict[str, float], text: str) -> float:
         """Calculate the intensity of emotion/sentiment in the text."""
         # Base intensity on:
@@ -127,28 +212,23 @@ class SentimentAnalyzerAgent:
             
         return min(1.0, intensity)
     
-    def _extract_sentiment_phrases(self, text: str, primary_sentiment: str) -> List[str]:
+    def _extract_sentiment_phrases(self, sentences: List[Tuple[str, Dict[str, int]]], primary_sentiment: str) -> List[str]:
         """Extract key phrases that express the primary sentiment."""
-        sentences = re.split(r'[.!?]+', text)
         key_phrases = []
         
         keywords = self.sentiment_indicators[primary_sentiment]
         
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-                
+        for sentence, positions in sentences:
             # Check if sentence contains any sentiment keywords
-            if any(keyword in sentence.lower() for keyword in keywords):
+            found = [keyword for keyword in keywords if keyword in positions]
+            if found:
                 if len(sentence) > 100:
                     # Shorten long sentences
-                    for keyword in keywords:
-                        if keyword in sentence.lower():
-                            start = max(0, sentence.lower().find(keyword) - 40)
-                            end = min(len(sentence), sentence.lower().find(keyword) + 40)
-                            phrase = sentence[start:end]
-                            key_phrases.append(f"...{phrase}...")
+                    for keyword in found:
+                        start = max(0, positions[keyword] - 40)
+                        end = min(len(sentence), positions[keyword] + 40)
+                        phrase = sentence[start:end]
+                        key_phrases.append(f"...{phrase}...")
                 else:
                     key_phrases.append(sentence)
                     
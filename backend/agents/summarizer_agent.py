@@ -6,7 +6,7 @@ This agent analyzes support tickets and provides a concise summary, key points,
 """
 
 import json
-import requests
+from ollama_client import get_client
 
 class SummarizerAgent:
     def __init__(self, ollama_url, model):
@@ -54,14 +54,10 @@ class SummarizerAgent:
     def _call_ollama(self, prompt):
         """Call Ollama API with the given prompt"""
         try:
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "system": self.system_prompt,
-                    "stream": False
-                }
+            response = get_client(self.ollama_url).generate(
+                self.model,
+                prompt,
+                system=self.system_prompt
             )
             
             if response.status_code == 200:
@@ -1,11 +1,28 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import requests
 import os
 import json
+import queue
+import hashlib
+import time
+import asyncio
 from datetime import datetime
-import google.generativeai as genai
+from bisect import bisect_left
 from data_loader import DataLoader
+from agents.sentiment_analyzer import SentimentAnalyzerAgent
+from agent_pool import AgentPool
+from agent_prompts import (
+    AGENT_DEPENDENCIES, build_agent_prompt, build_agent_prompts, context_budget, select_agents, shared_prefix
+)
+from ollama_client import OllamaPool
+from llm_cache import ResponseCache
+from gemini_client import GeminiClient, GEMINI_MODEL
+from http_cache import conditional_json, decode_cursor, encode_cursor, make_etag, page_size
+from fused_analysis import build_fused_prompt, fused_instruction_tokens, fused_schema, split_sections
+from deadline import after as deadline_after, deadline_scope, remaining as deadline_remaining, timed_out
+from job_queue import JobQueue, QueueFull
+from singleflight import SingleFlight
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, collect_calls, record_tokens, render as render_metrics
 
 app = Flask(__name__)
 # Enable CORS with more specific settings
@@ -14,18 +31,129 @@ CORS(app, resources={r"/*": {"origins": "*"}})
 # Configuration for Ollama
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+# Comma-separated Ollama nodes to spread calls over; defaults to OLLAMA_URL alone
+OLLAMA_URLS = [url.strip() for url in os.environ.get("OLLAMA_URLS", OLLAMA_URL).split(",") if url.strip()]
 DEFAULT_MODEL = os.environ.get("OLLAMA_MODEL", "llama3")
 
-# Initialize data loader
+# Configuration for the concurrent agent fan-out
+PARALLEL_AGENTS = os.environ.get("PARALLEL_AGENTS", "true").lower() == "true"
+BACKEND_CONCURRENCY = {
+    "ollama": int(os.environ.get("OLLAMA_MAX_CONCURRENCY", str(6 * len(OLLAMA_URLS)))),  # across all nodes
+    "gemini": int(os.environ.get("GEMINI_MAX_CONCURRENCY", "6")),
+}
+# A sync call holds a pool thread while it waits for its backend slot, so by default every slot gets a thread
+AGENT_POOL_SIZE = int(os.environ.get("AGENT_POOL_SIZE", str(sum(BACKEND_CONCURRENCY.values()))))
+FUSED_ANALYSIS = os.environ.get("FUSED_ANALYSIS", "false").lower() == "true"  # one generation for all agents
+# Sentiment is answered by the local rule-based analyzer unless its confidence is below the threshold
+SENTIMENT_CASCADE = os.environ.get("SENTIMENT_CASCADE", "true").lower() == "true"
+SENTIMENT_CONFIDENCE_THRESHOLD = float(os.environ.get("SENTIMENT_CONFIDENCE_THRESHOLD", "0.6"))
+BATCH_MAX_IN_FLIGHT = int(os.environ.get("BATCH_MAX_IN_FLIGHT", "4"))  # tickets per /process-tickets request
+
+# Gemini calls run on the agent pool's event loop instead of holding a worker thread each
+GEMINI_ASYNC = os.environ.get("GEMINI_ASYNC", "true").lower() == "true"
+
+# Configuration for the LLM response cache
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_DB = os.environ.get("LLM_CACHE_DB")  # SQLite path; unset keeps the cache in memory only
+
+# Seconds between checks of the data directory for new tickets and conversations; 0 disables
+DATA_WATCH_INTERVAL = float(os.environ.get("DATA_WATCH_INTERVAL", "30"))
+
+# Time /process-ticket gives its agents; agents still running then are reported as {"timedOut": true}.
+# Requests can set their own with an X-Deadline-Ms header or "deadlineMs" field; 0 disables the default
+REQUEST_DEADLINE_MS = int(os.environ.get("REQUEST_DEADLINE_MS", "120000"))
+# Default deadlines by ticket priority, e.g. "critical=30000,high=60000"; others get REQUEST_DEADLINE_MS
+PRIORITY_DEADLINES_MS = {
+    priority.strip().lower(): int(milliseconds)
+    for priority, milliseconds in (
+        entry.split("=", 1)
+        for entry in os.environ.get("PRIORITY_DEADLINES_MS", "critical=30000,urgent=30000,high=60000").split(",")
+        if entry.strip()
+    )
+}
+
+# Configuration for the /jobs queue
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))  # tickets analysed at once from the queue
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "100"))  # queued tickets before 429s
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", "3600"))  # seconds a finished job can be polled
+JOB_DB = os.environ.get("JOB_DB")  # SQLite path shared by server workers, so any of them can answer a poll
+
+# Set by gunicorn.conf.py: the app is imported once in the server's parent process and forked into
+# workers, which share its loaded data and start their own threads and connections in start_worker()
+SERVER_PREFORK = os.environ.get("SERVER_PREFORK", "false").lower() == "true"
+
+# Model that answers for each backend, part of the cache key
+BACKEND_MODELS = {
+    "ollama": DEFAULT_MODEL,
+    "gemini": GEMINI_MODEL,
+}
+
+# Pooled keep-alive connections to the Ollama nodes, shared by every request
+ollama_client = OllamaPool(OLLAMA_URLS, max_concurrency=BACKEND_CONCURRENCY["ollama"])
+
+# Gemini is configured once, and only when a key is available
+gemini_client = GeminiClient(GEMINI_API_KEY) if GEMINI_API_KEY else None
+
+# Initialize data loader; start_worker() keeps it up to date with files added to the data directory
 data_loader = DataLoader()
 
+# Unresolved sample tickets listed after the historical ones by /tickets.
+# Created once, so repeated polls return identical bodies and can be answered with 304s.
+SAMPLE_TICKETS_CREATED_AT = datetime.now().isoformat()
+SAMPLE_TICKETS = [
+    {
+        "id": "T006",
+        "subject": "Payment gateway error",
+        "description": "Unable to process payment for the subscription.",
+        "customerName": "Alice Brown",
+        "customerEmail": "alice.brown@example.com",
+        "createdAt": SAMPLE_TICKETS_CREATED_AT,
+        "status": "new",
+    },
+    {
+        "id": "T007",
+        "subject": "Feature request: Multi-language support",
+        "description": "Requesting support for multiple languages in the app.",
+        "customerName": "Carlos Garcia",
+        "customerEmail": "carlos.garcia@example.com",
+        "createdAt": SAMPLE_TICKETS_CREATED_AT,
+        "status": "new",
+    },
+    {
+        "id": "T008",
+        "subject": "App crashes on startup",
+        "description": "The app crashes immediately after launching on Android devices.",
+        "customerName": "Diana Evans",
+        "customerEmail": "diana.evans@example.com",
+        "createdAt": SAMPLE_TICKETS_CREATED_AT,
+        "status": "new",
+    },
+]
+
+# Local first tier of the sentiment cascade
+sentiment_analyzer = SentimentAnalyzerAgent()
+
+# Responses to prompts we have already answered
+response_cache = ResponseCache(LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_DB)
+
+# Shared pool for running the agents of a ticket concurrently
+agent_pool = AgentPool(AGENT_POOL_SIZE, BACKEND_CONCURRENCY)
+
+# Identical ticket analyses requested at the same time run once
+ticket_analyses = SingleFlight("analyze_ticket")
+
+# When start_worker() ran in this process; /ready answers 503 until it has
+worker_started_at = None
+
 @app.route('/', methods=['GET'])
 def index():
     """Root endpoint for basic connectivity check"""
     return jsonify({
         "status": "ok",
         "message": "AI Customer Support System Backend API is running",
-        "endpoints": ["/status", "/historical-data", "/conversations", "/process-ticket", "/tickets"]
+        "endpoints": ["/status", "/historical-data", "/conversations", "/process-ticket", "/process-ticket/stream", "/process-tickets", "/tickets", "/ingest", "/metrics", "/jobs", "/ready"]
     })
 
 @app.route('/status', methods=['GET'])
@@ -33,7 +161,7 @@ def status():
     """Check if the backend server is running and can connect to Ollama"""
     try:
         # Check if Ollama is accessible
-        response = requests.get(f"{OLLAMA_URL}/api/tags")
+        response = ollama_client.tags()
         
         if response.status_code == 200:
             models = response.json().get('models', [])
@@ -41,217 +169,616 @@ def status():
                 "status": "ok",
                 "ollama_connected": True,
                 "models": models,
+                "ollama_nodes": ollama_client.stats(),
                 "historical_tickets": len(data_loader.historical_tickets),
-                "conversations": len(data_loader.conversations)
+                "conversations": len(data_loader.conversations),
+                "cache": response_cache.stats(),
+                "jobs": job_queue.stats(),
+                "coalescing": ticket_analyses.stats()
             })
         else:
             return jsonify({
                 "status": "warning",
                 "ollama_connected": False,
+                "ollama_nodes": ollama_client.stats(),
                 "message": f"Ollama API returned status code {response.status_code}"
             })
     except Exception as e:
         return jsonify({
             "status": "error",
             "ollama_connected": False,
+            "ollama_nodes": ollama_client.stats(),
             "message": str(e)
         }), 500
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness of the worker process that answers: data loaded and its background threads running"""
+    checks = worker_checks()
+    return jsonify({
+        "ready": all(checks.values()),
+        "pid": os.getpid(),
+        "startedAt": worker_started_at,
+        "checks": checks,
+        "dataVersion": data_loader.view.version,
+        "historical_tickets": len(data_loader.historical_tickets),
+        "conversations": len(data_loader.conversations),
+    }), 200 if all(checks.values()) else 503
+
+def worker_checks():
+    return {
+        "started": worker_started_at is not None,
+        "data": data_loader.view is not None,
+        "dataWatcher": DATA_WATCH_INTERVAL <= 0 or data_loader.watching(),
+        "jobWorkers": job_queue.alive(),
+    }
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Agent latency, token, cache and error metrics in the Prometheus text format"""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/historical-data', methods=['GET'])
 def get_historical_data():
-    """Return all historical ticket data"""
-    return jsonify(data_loader.historical_tickets)
+    """Return historical ticket data
+
+    Optional filters: status, category, priority, from, to (resolution date, inclusive).
+    Passing limit or cursor switches to a paginated {"items", "nextCursor", "total"} body.
+    """
+    def build_payload(view):
+        positions = historical_positions(view, request.args)
+        return paginate(request.args, positions, lambda position: view.historical_tickets[position].to_dict())
+
+    return listing_response(build_payload)
 
 @app.route('/conversations', methods=['GET'])
 def get_conversations():
     """Return all conversation examples"""
-    return jsonify(data_loader.conversations)
+    return jsonify(dict(data_loader.conversations))
 
 @app.route('/tickets', methods=['GET'])
 def get_tickets():
-    """Return all tickets (historical tickets as support tickets)"""
-    tickets = [
-        {
-            "id": ticket.get("Ticket ID", "Unknown"),
-            "subject": ticket.get("Issue Category", "No Subject"),
-            "description": ticket.get("Solution", "No Description"),
-            "customerName": "Historical Data",
-            "customerEmail": "historical@example.com",
-            "createdAt": ticket.get("Date of Resolution", "Unknown Date"),
-            "status": "resolved" if ticket.get("Resolution Status", "").lower() == "resolved" else "new",
-        }
-        for ticket in data_loader.historical_tickets
-    ]
-
-    # Add more unresolved tickets
-    tickets.extend([
-        {
-            "id": "T006",
-            "subject": "Payment gateway error",
-            "description": "Unable to process payment for the subscription.",
-            "customerName": "Alice Brown",
-            "customerEmail": "alice.brown@example.com",
-            "createdAt": datetime.now().isoformat(),
-            "status": "new",
-        },
-        {
-            "id": "T007",
-            "subject": "Feature request: Multi-language support",
-            "description": "Requesting support for multiple languages in the app.",
-            "customerName": "Carlos Garcia",
-            "customerEmail": "carlos.garcia@example.com",
-            "createdAt": datetime.now().isoformat(),
-            "status": "new",
-        },
-        {
-            "id": "T008",
-            "subject": "App crashes on startup",
-            "description": "The app crashes immediately after launching on Android devices.",
-            "customerName": "Diana Evans",
-            "customerEmail": "diana.evans@example.com",
-            "createdAt": datetime.now().isoformat(),
-            "status": "new",
-        },
-    ])
-    return jsonify(tickets)
+    """Return all tickets (historical tickets as support tickets)
+
+    Takes the same filters and pagination parameters as /historical-data.
+    """
+    def build_payload(view):
+        positions = historical_positions(view, request.args)
+        # Sample unresolved tickets follow the historical ones; they only have a status
+        demo_filtered = any(request.args.get(key) for key in ("category", "priority", "from", "to"))
+        if not demo_filtered and request.args.get("status", "new").lower() == "new":
+            offset = len(view.historical_tickets)
+            positions = list(positions) + [offset + i for i in range(len(SAMPLE_TICKETS))]
+        return paginate(request.args, positions, lambda position: ticket_at(view, position))
+
+    # The sample tickets are recreated, with a new createdAt, when the server starts
+    return listing_response(build_payload, SAMPLE_TICKETS_CREATED_AT)
+
+def historical_positions(view, args):
+    """Historical row positions matching the filters in the query string"""
+    filters = {field: args.get(field) for field in DataLoader.FILTER_FIELDS}
+    return view.find_ticket_positions(filters, args.get("from"), args.get("to"))
+
+def ticket_at(view, position):
+    """Build the /tickets entry for a position (historical rows first, then samples)"""
+    historical = view.historical_tickets
+    if position >= len(historical):
+        return SAMPLE_TICKETS[position - len(historical)]
+    ticket = historical[position]
+    return {
+        "id": ticket.get("Ticket ID", "Unknown"),
+        "subject": ticket.get("Issue Category", "No Subject"),
+        "description": ticket.get("Solution", "No Description"),
+        "customerName": "Historical Data",
+        "customerEmail": "historical@example.com",
+        "createdAt": ticket.get("Date of Resolution", "Unknown Date"),
+        "status": DataLoader.ticket_status(ticket),
+    }
+
+def paginate(args, positions, build_item):
+    """Build the whole list, or one page of it when limit or cursor is given"""
+    if "limit" not in args and "cursor" not in args:
+        return [build_item(position) for position in positions]
+
+    start = bisect_left(positions, decode_cursor(args["cursor"])) if args.get("cursor") else 0
+    selected = positions[start:start + page_size(args)]
+    next_start = start + len(selected)
+    return {
+        "items": [build_item(position) for position in selected],
+        "nextCursor": encode_cursor(positions[next_start]) if next_start < len(positions) else None,
+        "total": len(positions),
+    }
+
+def listing_response(build_payload, variant=None):
+    """Conditional, compressed JSON response for a listing endpoint
+
+    The payload is built from the data view current when the request arrived,
+    so it always matches the data fingerprint in its ETag. variant stands for
+    anything else in the payload that can change.
+    """
+    view = data_loader.view
+    fingerprint = view.fingerprint
+    if variant is not None:
+        fingerprint = hashlib.sha1(f"{fingerprint}:{variant}".encode("utf-8")).hexdigest()[:16]
+    try:
+        return conditional_json(make_etag(fingerprint, request.args), lambda: build_payload(view))
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """Add historical tickets and conversations without a restart
+
+    Optional body: {"tickets": [{<CSV column>: value}], "conversations": {<category>: transcript}}.
+    Tickets are appended to the CSV and conversations saved as data/Conversation files;
+    then everything new in the data directory is indexed and swapped in. An empty
+    body only rescans the directory, e.g. after a nightly export was copied there.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+    try:
+        changes = data_loader.ingest(body.get("tickets") or [], body.get("conversations") or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    view = data_loader.view
+    return jsonify({
+        "added": changes,
+        "version": view.version,
+        "historical_tickets": len(view.historical_tickets),
+        "conversations": len(view.conversations)
+    })
 
 @app.route('/process-ticket', methods=['POST'])
 def process_ticket():
-    """Process a ticket using multiple specialized agents"""
+    """Process a ticket using multiple specialized agents
+
+    With "includeTimings": true the response also carries a "timings" block with
+    the retrieval and total time and, per agent call, its queue and wall time,
+    token counts and cache outcome.
+
+    The agents get until the request deadline (see request_deadline_ms); the
+    response is sent then, with {"timedOut": true} for each agent that had not finished.
+
+    "agents": ["routing", ...] runs only those agents. Agents that build on
+    another's answer (timeEstimation on routing, recommendations on actions)
+    wait for it when both are requested, and run without it otherwise.
+    """
     try:
         data = request.json
         ticket = data.get('ticket')
-        model = data.get('model', DEFAULT_MODEL)
         
         if not ticket:
             return jsonify({"error": "No ticket data provided"}), 400
-        
-        # Get historical data for context
-        historical_context = data_loader.get_combined_data_for_ticket(ticket)
-        
-        # Process the ticket with multiple agents
-        results = {}
-        
-        agent_functions = {
-            "ollama": call_ollama_agent,
-            "gemini": call_gemini_agent
-        }
-        
-        selected_agent = agent_functions.get(model, call_ollama_agent)  # Default to Ollama
 
-        # --- Agent Prompts ---
-        # To improve readability, prompts are defined as variables
-        
-        def create_agent_prompt(role, instructions, ticket_info, extra_info=""):
-            return f"""{instructions}
-
-Ticket: {ticket_info['subject']}
-Description: {ticket_info['description']}
-{extra_info}
-
-Format your response as valid JSON."""
-
-        # Summarizer
-        results["summary"] = selected_agent(create_agent_prompt(
-            "Summarizer",
-            """You are a customer support AI that accurately summarizes tickets. Analyze this support ticket and provide:
-1. A concise summary (3-4 sentences)
-2. 3-5 key points
-3. Customer sentiment (positive, neutral, or negative)""",
-            ticket,
-            ""
-        ))
-
-        # Action Extractor
-        results["actions"] = selected_agent(create_agent_prompt(
-            "Action Extractor",
-            """You are a customer support expert who identifies required actions. Analyze this support ticket and extract required actions:
-Identify 2-4 specific actions that should be taken to resolve this ticket.
-Each action should have:
-1. A type (investigation, customer contact, technical fix, escalation, etc.)
-2. A priority (low, medium, high)
-3. A clear description of what needs to be done""",
-            ticket,
-            ""
-        ))
-
-        # Team Router
-        results["routing"] = selected_agent(create_agent_prompt(
-            "Team Router",
-            """You are a ticket routing specialist. Analyze this support ticket and determine which team it should be routed to:
-Choose the most appropriate team and explain your reasoning.
-Potential teams: technical-support, billing, account-management, product-feedback, security, legal""",
-            ticket,
-            ""
-        ))
-
-        # Sentiment Analyzer
-        results["sentiment"] = selected_agent(create_agent_prompt(
-            "Sentiment Analyzer",
-            """You are a sentiment analysis specialist who can detect emotions and tone in text. Perform a detailed sentiment analysis of this customer support ticket:
-Analyze the customer's emotions, tone, and attitude in the message.
-Be specific about the different emotions detected and their intensity.""",
-            ticket,
-            ""
-        ))
-
-        # Resolution Recommender
-        results["recommendations"] = selected_agent(create_agent_prompt(
-            "Resolution Recommender",
-            """You are a support resolution specialist with access to historical cases. Based on this support ticket and historical data, recommend potential resolutions:
-Provide 1-3 suggested resolutions with clear steps.""",
-            ticket,
-            f"Historical Context:\n{historical_context}"
-        ))
-
-        # Time Estimator
-        results["timeEstimation"] = selected_agent(create_agent_prompt(
-            "Time Estimator",
-            """You are a support resolution time estimator. Estimate how long it will take to resolve this support ticket:
-Estimate the resolution time in minutes and explain the factors that influenced your estimate.""",
-            ticket,
-            f"Historical Context:\n{historical_context}"
-        ))
-
-        return jsonify(results)
+        try:
+            select_agents(data.get('agents'))
+            deadline_ms = request_deadline_ms(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify(run_ticket_analysis(data, deadline_ms))
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def call_ollama_agent(prompt, model=DEFAULT_MODEL):
-    """Call Ollama API with the given prompt (which includes system prompt)"""
+def request_deadline_ms(data):
+    """Milliseconds a ticket's agents get: X-Deadline-Ms header, "deadlineMs" field, priority or server default
+
+    Returns None when there is no limit; raises ValueError for a value that is not a positive number.
+    """
+    value = request.headers.get('X-Deadline-Ms', data.get('deadlineMs'))
+    if value is None:
+        priority = str(data['ticket'].get('priority', '')).lower()
+        return PRIORITY_DEADLINES_MS.get(priority, REQUEST_DEADLINE_MS) or None
+    try:
+        milliseconds = float(value)
+    except (TypeError, ValueError):
+        milliseconds = 0
+    if milliseconds <= 0:
+        raise ValueError("deadlineMs must be a positive number of milliseconds")
+    return int(milliseconds) if milliseconds.is_integer() else milliseconds
+
+def run_ticket_analysis(data, deadline_ms=None):
+    """Analyze the ticket of a /process-ticket body, adding the timings block when asked for
+
+    Requests for the same analysis that arrive while it is running wait for it
+    instead of starting their own; their timings say "coalesced" and list no agents.
+    Agents that missed the deadline of the request that started it are run again
+    for a waiting request that still has time left.
+    The deadline counts from this call, so a queued job's starts when a worker takes it.
+    """
+    model = data.get('model', DEFAULT_MODEL)
+    deadline_ms = deadline_ms or data.get('deadlineMs')
+    with collect_calls() as calls, deadline_scope(deadline_after(deadline_ms) if deadline_ms else None):
+        started = time.perf_counter()
+        try:
+            (results, retrieval_seconds), coalesced = ticket_analyses.do(
+                analysis_key(data, model), lambda: analyze_ticket(data, data['ticket'], model),
+                deadline_remaining())
+        except TimeoutError:
+            # Joined an identical analysis that is still running past this request's deadline
+            agents = select_agents(data.get('agents'))
+            results, retrieval_seconds, coalesced = {name: timed_out() for name in agents}, 0, True
+        results = dict(results)  # shared between coalesced requests
+
+        late = [name for name, result in results.items() if isinstance(result, dict) and result.get("timedOut")]
+        left = deadline_remaining()
+        if coalesced and late and (left is None or left > 0):
+            rerun, _ = analyze_ticket(dict(data, agents=late), data['ticket'], model)
+            results.update(rerun)
+
+    if data.get('includeTimings'):
+        results["timings"] = {
+            "totalMs": round((time.perf_counter() - started) * 1000, 1),
+            "retrievalMs": round(retrieval_seconds * 1000, 1),
+            "deadlineMs": deadline_ms,
+            "coalesced": coalesced,
+            "agents": {call.agent: call.timing() for call in calls},
+        }
+    return results
+
+def analysis_key(data, model):
+    """Key of everything in a /process-ticket body that changes its results"""
+    options = {
+        "ticket": data['ticket'],
+        "model": model,
+        "fused": data.get('fused', FUSED_ANALYSIS),
+        "sentimentCascade": data.get('sentimentCascade', SENTIMENT_CASCADE),
+        "bypassCache": data.get('bypassCache', False),
+        "agents": select_agents(data.get('agents')),
+    }
+    return hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+# Workers analysing queued tickets; their agent calls share the pool's backend limits
+job_queue = JobQueue(run_ticket_analysis, JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RESULT_TTL, JOB_DB)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a ticket for analysis and return its job id without waiting
+
+    Takes the same body as /process-ticket. Tickets are analysed in order of
+    priority (critical/urgent, high, medium, low), then arrival. Poll
+    GET /jobs/<id> for the result. When the queue is full the response is a 429
+    with a Retry-After estimate of when there will be room.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('ticket'), dict):
+        return jsonify({"error": "No ticket data provided"}), 400
+    try:
+        select_agents(data.get('agents'))
+        # Resolved now, while the header is at hand; it counts from when a worker takes the job
+        data = dict(data, deadlineMs=request_deadline_ms(data))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     try:
-        response = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json={"model": model, "prompt": prompt, "stream": False}  # Use combined prompt
+        job = job_queue.submit(data, JobQueue.lane_for(data['ticket']))
+    except QueueFull as e:
+        response = jsonify({"error": str(e), "retryAfter": e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+
+    response = jsonify({"jobId": job.id, "status": job.status, "position": job_queue.position(job)})
+    response.headers['Location'] = f"/jobs/{job.id}"
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of a queued ticket, with its /process-ticket result once completed"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    payload = job.to_dict()
+    if job.status == "queued":
+        payload["position"] = job_queue.position(job)
+    return jsonify(payload)
+
+def analyze_ticket(data, ticket, model):
+    """Run the agents /process-ticket asked for; returns the results and the retrieval time"""
+    agents = select_agents(data.get('agents'))
+    parallel = data.get('parallel', PARALLEL_AGENTS)
+    fused = data.get('fused', FUSED_ANALYSIS)
+
+    # Get historical data for context; a fused prompt holds every agent's instructions after it
+    retrieval_started = time.perf_counter()
+    token_budget = context_budget(ticket, fused_instruction_tokens(agents) if fused else None)
+    historical_context = data_loader.get_combined_data_for_ticket(ticket, token_budget=token_budget)
+    retrieval_seconds = time.perf_counter() - retrieval_started
+
+    # Process the ticket with the requested agents
+    results = {}
+    backend, selected_agent = select_agent(model, data.get('bypassCache', False))
+    prefix = shared_prefix(ticket, historical_context)
+
+    # Skip the sentiment LLM call when the local analyzer is confident enough
+    local_sentiment = None
+    if not fused and "sentiment" in agents and data.get('sentimentCascade', SENTIMENT_CASCADE):
+        local_sentiment = sentiment_analyzer.analyze_with_confidence(ticket)
+        if local_sentiment["confidence"] >= SENTIMENT_CONFIDENCE_THRESHOLD:
+            agents.remove("sentiment")
+
+    prompt_for = lambda name, upstream: build_agent_prompt(name, prefix, upstream)
+    if fused:
+        prompts = build_agent_prompts(ticket, historical_context, agents)
+        results = run_fused_analysis(backend, selected_agent, ticket, historical_context, prompts,
+                                     data.get('bypassCache', False))
+    elif parallel:
+        results = agent_pool.run_graph(backend, selected_agent, agents, AGENT_DEPENDENCIES, prompt_for)
+    else:
+        # Run order already puts every agent after the agents it depends on
+        for name in agents:
+            upstream = {dependency: results[dependency] for dependency in AGENT_DEPENDENCIES.get(name, ())
+                        if dependency in results}
+            results[name] = agent_pool.call(backend, selected_agent, prompt_for(name, upstream), name)
+
+    if local_sentiment is not None:
+        apply_sentiment_cascade(results, local_sentiment)
+
+    return results, retrieval_seconds
+
+@app.route('/process-ticket/stream', methods=['POST'])
+def process_ticket_stream():
+    """Process a ticket like /process-ticket, streaming agent output as server-sent events
+
+    Emits a "token" event per generated chunk (Ollama only), a "result" event with
+    the parsed JSON once each agent finishes, and a final "done" event. At the
+    request deadline, agents still running get a {"timedOut": true} result event.
+    "agents" selects and orders the agents as for /process-ticket.
+    """
+    data = request.json or {}
+    ticket = data.get('ticket')
+    if not ticket:
+        return jsonify({"error": "No ticket data provided"}), 400
+    try:
+        agents = select_agents(data.get('agents'))
+        deadline_ms = request_deadline_ms(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    deadline = deadline_after(deadline_ms) if deadline_ms else None
+
+    bypass_cache = data.get('bypassCache', False)
+    backend, selected_agent = select_agent(data.get('model', DEFAULT_MODEL), bypass_cache)
+    historical_context = data_loader.get_combined_data_for_ticket(ticket, token_budget=context_budget(ticket))
+    prefix = shared_prefix(ticket, historical_context)
+    events = queue.Queue()
+
+    def agent_for(name):
+        if backend != "ollama":
+            return selected_agent
+        on_token = lambda delta: events.put(("token", {"agent": name, "delta": delta}))
+        return cached_agent(backend, lambda prompt: stream_ollama_agent(prompt, on_token), bypass_cache)
+
+    def report_result(name, result):
+        events.put(("result", {"agent": name, "result": result}))
+
+    with deadline_scope(deadline):
+        stop = agent_pool.start_graph(
+            backend, agent_for, agents, AGENT_DEPENDENCIES,
+            lambda name, upstream: build_agent_prompt(name, prefix, upstream), report_result
+        )
+
+    def generate():
+        pending = set(agents)
+        try:
+            yield sse_event("start", {"agents": agents})
+            while pending:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    event, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    for name in pending:
+                        yield sse_event("result", {"agent": name, "result": timed_out()})
+                    break
+                if event == "result":
+                    pending.discard(payload["agent"])
+                yield sse_event(event, payload)
+            yield sse_event("done", {})
+        finally:
+            stop(deadline_passed=bool(pending) and deadline is not None and time.monotonic() >= deadline)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def apply_sentiment_cascade(results, local_sentiment):
+    """Fill the sentiment slot from the local analysis, or tag the LLM answer it escalated to"""
+    if "sentiment" not in results:
+        local_sentiment["tier"] = "rules"
+        results["sentiment"] = local_sentiment
+    elif isinstance(results["sentiment"], dict) and not results["sentiment"].get("timedOut"):
+        results["sentiment"]["tier"] = "llm"
+        results["sentiment"]["rulesConfidence"] = local_sentiment["confidence"]
+
+def run_fused_analysis(backend, selected_agent, ticket, historical_context, prompts, bypass_cache=False):
+    """Ask for the sections of prompts in one generation, re-running only the sections that fail validation"""
+    if not prompts:
+        return {}
+    if backend == "ollama":
+        schema = fused_schema(prompts)
+        fused_agent = cached_agent(
+            backend,
+            lambda prompt: call_ollama_agent(prompt, format=schema),
+            bypass_cache
         )
+    else:
+        fused_agent = selected_agent
+
+    fused_prompt = build_fused_prompt(ticket, historical_context, prompts)
+    response = agent_pool.result(agent_pool.submit(backend, fused_agent, fused_prompt, "fused"))
+    sections, failed = split_sections(response, prompts)
+
+    if failed:
+        retry_prompts = {name: prompts[name] for name in failed}
+        sections.update(agent_pool.run_all(backend, selected_agent, retry_prompts))
+
+    return {name: sections[name] for name in prompts}
+
+def sse_event(event, payload):
+    """Format a server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/process-tickets', methods=['POST'])
+def process_tickets():
+    """Process a batch of tickets, streaming each result as a line of JSON as soon as it is ready
+
+    Accepts either a JSON body {"tickets": [...], "model": ...} or an NDJSON body
+    with one ticket per line (model, bypassCache and agents then come from the query
+    string, agents comma-separated). In a batch the selected agents run independently.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        options = request.args
+        tickets = (parse_json_line(line) for line in request.stream if line.strip())
+    else:
+        options = request.json or {}
+        tickets = options.get('tickets')
+        if not isinstance(tickets, list):
+            return jsonify({"error": "No tickets provided"}), 400
+
+    requested = options.get('agents')
+    if isinstance(requested, str):
+        requested = [name.strip() for name in requested.split(",") if name.strip()]
+    try:
+        agents = select_agents(requested)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    bypass_cache = str(options.get('bypassCache', False)).lower() == 'true'
+    backend, selected_agent = select_agent(options.get('model', DEFAULT_MODEL), bypass_cache)
+    rejected = []
+
+    def jobs():
+        # Prompts are built lazily, only when the pool has room for another ticket
+        for position, ticket in enumerate(tickets):
+            if not isinstance(ticket, dict) or 'subject' not in ticket or 'description' not in ticket:
+                rejected.append(position)
+                continue
+            historical_context = data_loader.get_combined_data_for_ticket(ticket, token_budget=context_budget(ticket))
+            yield (position, ticket.get('id')), build_agent_prompts(ticket, historical_context, agents)
+
+    def flush_rejected():
+        while rejected:
+            yield json.dumps({"index": rejected.pop(0), "error": "Ticket is missing subject or description"}) + "\n"
+
+    def generate():
+        for (position, ticket_id), results in agent_pool.run_batch(
+                backend, selected_agent, jobs(), BATCH_MAX_IN_FLIGHT):
+            yield from flush_rejected()
+            yield json.dumps({"index": position, "id": ticket_id, "results": results}) + "\n"
+        yield from flush_rejected()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def parse_json_line(line):
+    """Parse one NDJSON line, returning None when it is not valid JSON"""
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+def select_agent(model, bypass_cache=False):
+    """Pick the backend for a requested model and return it with its (cached) agent function"""
+    agent_functions = {
+        "ollama": call_ollama_agent,
+        "gemini": call_gemini_agent_async if GEMINI_ASYNC else call_gemini_agent
+    }
+    backend = model if model in agent_functions else "ollama"  # Default to Ollama
+    return backend, cached_agent(backend, agent_functions[backend], bypass_cache)
+
+def cached_agent(backend, agent_fn, bypass=False):
+    """Wrap an agent function so identical prompts are answered from the response cache"""
+    if not LLM_CACHE_ENABLED:
+        return agent_fn
+
+    if asyncio.iscoroutinefunction(agent_fn):
+        async def call_async(prompt):
+            return await response_cache.get_or_call_async(
+                backend, BACKEND_MODELS[backend], prompt, agent_fn, bypass
+            )
+        return call_async
+
+    def call(prompt):
+        return response_cache.get_or_call(backend, BACKEND_MODELS[backend], prompt, agent_fn, bypass)
+    return call
+
+def call_ollama_agent(prompt, model=DEFAULT_MODEL, **options):
+    """Call Ollama API with the given prompt (which includes system prompt)"""
+    try:
+        response = ollama_client.generate(model, prompt, **options)  # Use combined prompt
         if response.status_code == 200:
-            result = response.json().get("response", "")
-            try:
-                return json.loads(result)  # Attempt to parse JSON
-            except json.JSONDecodeError:
-                return {"text": result}  # Return as text if parsing fails
+            body = response.json()
+            record_tokens(body.get("prompt_eval_count"), body.get("eval_count"))
+            return parse_agent_output(body.get("response", ""))
         else:
             return {"error": f"Ollama API returned status code {response.status_code}"}
     except Exception as e:
         return {"error": str(e)}
 
+def stream_ollama_agent(prompt, on_token, model=DEFAULT_MODEL):
+    """Call Ollama in streaming mode, passing each text delta to on_token as it arrives"""
+    try:
+        chunks = []
+        for chunk in ollama_client.generate_stream(model, prompt):
+            delta = chunk.get("response", "")
+            if delta:
+                chunks.append(delta)
+                on_token(delta)
+            if chunk.get("done"):
+                record_tokens(chunk.get("prompt_eval_count"), chunk.get("eval_count"))
+        return parse_agent_output("".join(chunks))
+    except Exception as e:
+        return {"error": str(e)}
+
+def parse_agent_output(text):
+    """Parse a model's reply as JSON, falling back to the raw text"""
+    try:
+        return json.loads(text)  # Attempt to parse JSON
+    except json.JSONDecodeError:
+        return {"text": text}  # Return as text if parsing fails
+
 def call_gemini_agent(prompt):
     """Call Gemini API with the given prompt"""
-    if not GEMINI_API_KEY:
+    if not gemini_client:
         return {"error": "Gemini API key not configured."}
 
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel('gemini-pro')  # or 'gemini-pro-vision' if you need image support
-        response = model.generate_content(prompt)
-        if response and response.text:
-            try:
-                return json.loads(response.text)  # Attempt to parse JSON
-            except json.JSONDecodeError:
-                return {"text": response.text}  # Return as text if parsing fails
-        else:
-            return {"error": "Gemini API returned an empty or invalid response."}
+        return parse_gemini_output(gemini_client.generate(prompt))
+    except Exception as e:
+        return {"error": f"Error communicating with Gemini API: {e}"}
+
+async def call_gemini_agent_async(prompt):
+    """Call Gemini API with the given prompt without blocking a thread"""
+    if not gemini_client:
+        return {"error": "Gemini API key not configured."}
+
+    try:
+        return parse_gemini_output(await gemini_client.generate_async(prompt))
     except Exception as e:
         return {"error": f"Error communicating with Gemini API: {e}"}
 
+def parse_gemini_output(text):
+    if text:
+        return parse_agent_output(text)
+    return {"error": "Gemini API returned an empty or invalid response."}
+
+def start_worker():
+    """Start this process's background threads and connections
+
+    Runs on import, or under the pre-fork server in each worker once it has been
+    forked, as threads and open connections do not survive a fork. The loaded
+    data is not touched, so workers keep sharing the parent's copy.
+    """
+    global gemini_client, worker_started_at
+    if SERVER_PREFORK:
+        # Connections made in the parent process are not safe to share with it
+        gemini_client = GeminiClient(GEMINI_API_KEY) if GEMINI_API_KEY else None
+        response_cache.reopen()
+    if DATA_WATCH_INTERVAL > 0:
+        data_loader.watch(DATA_WATCH_INTERVAL)
+    ollama_client.start_health_checks()
+    job_queue.start()
+    worker_started_at = time.time()
+
+if not SERVER_PREFORK:
+    start_worker()
@@ -0,0 +1,167 @@
+"""
+Fake Ollama Server
+------------------
+Stand-in for the Ollama HTTP API used by the benchmarks. /api/generate waits for
+a configurable time to first token, then produces tokens at a fixed rate, either
+streamed as NDJSON chunks or returned in one body, and fails a configurable
+share of requests. Replies are JSON: an instance of the requested `format`
+schema when one is given, otherwise a single text field. /api/tags lists the
+served model.
+
+    python -m bench.fake_ollama --port 11435 --latency 0.2 --tokens-per-second 40
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, latency=0.2, tokens_per_second=40.0, response_tokens=60,
+                 failure_rate=0.0, model="llama3", seed=None):
+        """latency is seconds to the first token; failure_rate is the share of requests answered with a 500"""
+        super().__init__(address, FakeOllamaHandler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self.model = model
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_request(self):
+        """Count a request and decide whether it fails"""
+        with self.random_lock:
+            self.requests += 1
+            return self.random.random() < self.failure_rate
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like Ollama
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/api/tags":
+            return self.send_json(404, {"error": "not found"})
+        self.send_json(200, {"models": [{"name": self.server.model, "model": self.server.model}]})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            return self.send_json(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        server = self.server
+        failed = server.next_request()
+        time.sleep(server.latency)
+        if failed:
+            return self.send_json(500, {"error": "simulated failure"})
+
+        tokens = reply_tokens(request.get("format"), server.response_tokens)
+        prompt_tokens = len(request.get("prompt", "")) // 4
+        started = time.perf_counter_ns()
+        if request.get("stream", True):
+            self.stream_reply(request, tokens, prompt_tokens, started)
+        else:
+            time.sleep(len(tokens) / server.tokens_per_second)
+            self.send_json(200, self.final_chunk(request, "".join(tokens), tokens, prompt_tokens, started))
+
+    def stream_reply(self, request, tokens, prompt_tokens, started):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            time.sleep(1 / self.server.tokens_per_second)
+            self.write_chunk({"model": self.server.model, "response": token, "done": False})
+        self.write_chunk(self.final_chunk(request, "", tokens, prompt_tokens, started))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def final_chunk(self, request, response, tokens, prompt_tokens, started):
+        eval_duration = time.perf_counter_ns() - started
+        return {
+            "model": request.get("model", self.server.model),
+            "response": response,
+            "done": True,
+            "total_duration": eval_duration + int(self.server.latency * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(self.server.latency * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": eval_duration,
+        }
+
+    def write_chunk(self, payload):
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def reply_tokens(schema, response_tokens):
+    """A JSON reply split into roughly response_tokens tokens"""
+    if isinstance(schema, dict):
+        text = json.dumps(sample_for(schema))
+    else:
+        filler = "lorem ipsum dolor sit amet " * (response_tokens // 6 + 1)
+        text = json.dumps({"text": filler[:max(1, response_tokens * 4 - 12)]})
+    # Roughly four characters per token, like the models being replaced
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+def sample_for(schema):
+    """Smallest value that satisfies the JSON-schema subset used by fused analysis"""
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: sample_for(sub_schema) for key, sub_schema in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_for(schema.get("items", {})) for _ in range(max(1, schema.get("minItems", 0)))]
+    if kind == "number":
+        return 30
+    if "enum" in schema:
+        return schema["enum"][0]
+    return "lorem ipsum"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Ollama API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds to the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--model", default="llama3")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        (args.host, args.port), args.latency, args.tokens_per_second,
+        args.response_tokens, args.failure_rate, args.model
+    )
+    print(f"Fake Ollama listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Benchmarks
+----------
+Load generator for the backend. For each dataset size it writes a synthetic
+historical ticket CSV, serves the app from a child process against the fake
+Ollama server (so the load generator does not share the app's interpreter), and
+drives each scenario at each concurrency level with a closed loop of workers:
+
+    process-ticket   POST /process-ticket, every agent answered by the fake Ollama
+    tickets          GET /tickets?<--tickets-query>
+    retrieval        DataLoader.get_combined_data_for_ticket, in process
+    sentiment        SentimentAnalyzerAgent.analyze_ticket, in process (once, no dataset)
+
+Throughput and p50/p95/p99 latency are printed and written to a JSON file; pass
+an earlier file as --baseline to print the change for every matching run.
+
+    cd backend
+    python -m bench.run --sizes 1000 100000 --concurrency 1 8 32 --output before.json
+    python -m bench.run --sizes 1000 100000 --concurrency 1 8 32 --baseline before.json
+"""
+
+import os
+import csv
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import itertools
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))  # the app's modules import each other by top-level name
+SCENARIOS = ("process-ticket", "tickets", "retrieval", "sentiment")
+HTTP_SCENARIOS = {"process-ticket", "tickets"}
+
+CATEGORIES = [
+    "Software Installation Failure", "Network Connectivity Issue", "Device Compatibility Error",
+    "Account Synchronization Bug", "Payment Gateway Integration Failure", "Login Timeout",
+    "Refund Delay", "Data Export Failure", "Email Notification Missing", "Two Factor Authentication Issue",
+    "Subscription Upgrade Error", "Slow Dashboard Loading", "API Rate Limit Exceeded", "Password Reset Loop",
+]
+SENTIMENTS = ["Frustrated", "Confused", "Anxious", "Annoyed", "Urgent", "Calm"]
+PRIORITIES = ["Low", "Medium", "High", "Critical"]
+VERBS = ["Clear", "Reinstall", "Update", "Reset", "Verify", "Reconfigure", "Escalate", "Refund", "Re-sync", "Whitelist"]
+OBJECTS = [
+    "the app cache", "the payment token", "network permissions", "the antivirus exclusions", "the device firmware",
+    "the account session", "the billing profile", "the API key", "the export job", "the notification settings",
+]
+QUALIFIERS = ["and retry", "from the admin console", "on every device", "after signing out", "with the latest build", ""]
+FEELINGS = [
+    "This is really frustrating.", "I'm confused about what to do next.", "Please help, this is urgent!",
+    "Thanks for looking into it.", "I'm worried we will lose data.", "Honestly this is unacceptable.", "",
+]
+
+
+def write_dataset(directory, size, seed=0):
+    """Write a synthetic historical ticket CSV of size rows, plus the real conversations"""
+    directory = Path(directory)
+    csv_path = directory / "Historical_ticket_data.csv"
+    if csv_path.exists():
+        return directory
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    shutil.copytree(BACKEND_DIR / "data" / "Conversation", directory / "Conversation", dirs_exist_ok=True)
+
+    start = date(2023, 1, 1)
+    with open(csv_path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow(["Ticket ID", "Issue Category", "Sentiment", "Priority", "Solution",
+                         "Resolution Status", "Date of Resolution"])
+        for i in range(size):
+            writer.writerow([
+                f"BENCH_{i:07d}",
+                rng.choice(CATEGORIES),
+                rng.choice(SENTIMENTS),
+                rng.choice(PRIORITIES),
+                " ".join(filter(None, (rng.choice(VERBS), rng.choice(OBJECTS), rng.choice(QUALIFIERS)))),
+                "Resolved" if rng.random() < 0.85 else rng.choice(["Pending", "Escalated"]),
+                (start + timedelta(days=rng.randrange(3 * 365))).isoformat(),
+            ])
+    return directory
+
+
+def make_tickets(count=50, seed=1):
+    """Incoming tickets in the shape the frontend submits"""
+    rng = random.Random(seed)
+    tickets = []
+    for i in range(count):
+        category = rng.choice(CATEGORIES)
+        description = (
+            f"I tried to {rng.choice(VERBS).lower()} {rng.choice(OBJECTS)} but the {category.lower()} "
+            f"keeps happening after {rng.randint(1, 5)} attempts. {rng.choice(FEELINGS)}"
+        )
+        tickets.append({
+            "id": f"BENCH-T{i:03d}",
+            "subject": category,
+            "description": description.strip(),
+            "customerName": "Benchmark",
+            "customerEmail": "bench@example.com",
+            "createdAt": "2025-01-01T00:00:00",
+            "status": "new",
+        })
+    return tickets
+
+
+def serve_fake_ollama(options, ready):
+    """Child process: run the fake Ollama server and report its port"""
+    from bench.fake_ollama import FakeOllamaServer
+    server = FakeOllamaServer(("127.0.0.1", 0), **options)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def serve_app(env, ready):
+    """Child process: import the app with env applied and serve it on a free port"""
+    os.environ.update(env)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    from werkzeug.serving import make_server
+    import app
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    ready.put(server.port)
+    server.serve_forever()
+
+
+def start_process(context, target, argument, timeout):
+    """Start a child process and wait for the port it reports"""
+    ready = context.Queue()
+    process = context.Process(target=target, args=(argument, ready), daemon=True)
+    process.start()
+    return process, ready.get(timeout=timeout)
+
+
+def measure(operation, concurrency, total, warmup):
+    """Run operation(i) total times from concurrency threads; return throughput and latency"""
+    for i in range(warmup):
+        operation(i)
+
+    latencies = []
+    errors = []
+    counter = itertools.count()
+
+    def worker():
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            start = time.perf_counter()
+            try:
+                ok = operation(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors.append(i)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": len(errors),
+        "seconds": round(seconds, 4),
+        "throughput": round(len(ordered) / seconds, 2) if seconds else None,
+        "latencyMs": {
+            "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+            "p50": percentile(ordered, 50),
+            "p95": percentile(ordered, 95),
+            "p99": percentile(ordered, 99),
+            "max": round(ordered[-1] * 1000, 3),
+        },
+    }
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of sorted seconds, in milliseconds"""
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return round(ordered[rank - 1] * 1000, 3)
+
+
+def http_operation(scenario, base_url, tickets, args):
+    """Request function for an HTTP scenario; each worker thread gets its own session"""
+    local = threading.local()
+    process_options = json.loads(args.process_options)
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    if scenario == "process-ticket":
+        def operation(i):
+            body = {"ticket": tickets[i % len(tickets)], **process_options}
+            response = session().post(f"{base_url}/process-ticket", json=body)
+            if response.status_code != 200:
+                return False
+            return not any(isinstance(result, dict) and "error" in result for result in response.json().values())
+        return operation
+
+    def operation(i):
+        return session().get(f"{base_url}/tickets?{args.tickets_query}").status_code == 200
+    return operation
+
+
+def run(args):
+    context = multiprocessing.get_context("spawn")
+    tickets = make_tickets()
+    data_root = Path(args.data_root) if args.data_root else Path(tempfile.mkdtemp(prefix="bench-data-"))
+    fake_options = {
+        "latency": args.latency,
+        "tokens_per_second": args.tokens_per_second,
+        "response_tokens": args.response_tokens,
+        "failure_rate": args.failure_rate,
+        "seed": args.seed,
+    }
+    results = []
+    children = []
+    try:
+        fake_ollama, fake_port = start_process(context, serve_fake_ollama, fake_options, 30)
+        children.append(fake_ollama)
+
+        if "sentiment" in args.scenarios:
+            from agents.sentiment_analyzer import SentimentAnalyzerAgent
+            analyzer = SentimentAnalyzerAgent()
+            for concurrency in args.concurrency:
+                result = measure(lambda i: bool(analyzer.analyze_ticket(tickets[i % len(tickets)])),
+                                 concurrency, args.requests, args.warmup)
+                results.append(report("sentiment", None, concurrency, result))
+
+        for size in args.sizes:
+            dataset = write_dataset(data_root / f"tickets-{size}", size, args.seed)
+            app_process = None
+            if HTTP_SCENARIOS & set(args.scenarios):
+                app_env = {
+                    "OLLAMA_URL": f"http://127.0.0.1:{fake_port}",
+                    "DATA_DIR": str(dataset),
+                    "DATA_SNAPSHOT_PATH": "",
+                    "DATA_WATCH_INTERVAL": "0",
+                    "LLM_CACHE_ENABLED": "true" if args.cache else "false",
+                    "LLM_CACHE_DB": "",
+                }
+                app_process, app_port = start_process(context, serve_app, app_env, args.startup_timeout)
+                children.append(app_process)
+                base_url = f"http://127.0.0.1:{app_port}"
+
+            for scenario in args.scenarios:
+                if scenario == "sentiment":
+                    continue
+                if scenario == "retrieval":
+                    from data_loader import DataLoader
+                    loader = DataLoader(dataset)
+                    operation = lambda i: bool(loader.get_combined_data_for_ticket(tickets[i % len(tickets)]))
+                else:
+                    operation = http_operation(scenario, base_url, tickets, args)
+                for concurrency in args.concurrency:
+                    result = measure(operation, concurrency, args.requests, args.warmup)
+                    results.append(report(scenario, size, concurrency, result))
+
+            if app_process is not None:
+                app_process.terminate()
+                app_process.join()
+    finally:
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+        if not args.data_root:
+            shutil.rmtree(data_root, ignore_errors=True)
+    return results
+
+
+def report(scenario, size, concurrency, result):
+    entry = {"scenario": scenario, "datasetSize": size, "concurrency": concurrency, **result}
+    latency = result["latencyMs"]
+    print(f"{scenario:<15} {size if size is not None else '-':>8} {concurrency:>4}  "
+          f"{result['throughput']:>9.1f}/s  p50 {latency['p50']:>9.2f}ms  p95 {latency['p95']:>9.2f}ms  "
+          f"p99 {latency['p99']:>9.2f}ms  errors {result['errors']}", flush=True)
+    return entry
+
+
+def compare(results, baseline_path):
+    """Print throughput and p95 changes against the matching runs of an earlier results file"""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = json.load(file)
+    key = lambda entry: (entry["scenario"], entry["datasetSize"], entry["concurrency"])
+    previous = {key(entry): entry for entry in baseline["results"]}
+    print(f"\nChange against {baseline_path}:")
+    for entry in results:
+        before = previous.get(key(entry))
+        if before is None:
+            continue
+        throughput = change(before["throughput"], entry["throughput"])
+        p95 = change(before["latencyMs"]["p95"], entry["latencyMs"]["p95"])
+        size = entry["datasetSize"] if entry["datasetSize"] is not None else "-"
+        print(f"{entry['scenario']:<15} {size:>8} {entry['concurrency']:>4}  "
+              f"throughput {throughput:>8}  p95 {p95:>8}")
+
+
+def change(before, after):
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the support backend against a fake Ollama server")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000], help="historical tickets per dataset")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="measured requests per run")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Ollama seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--response-tokens", type=int, default=40)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--process-options", default="{}",
+                        help='extra /process-ticket body fields as JSON, e.g. \'{"fused": true}\'')
+    parser.add_argument("--tickets-query", default="limit=100")
+    parser.add_argument("--data-root", help="keep generated datasets here for reuse (default: temporary)")
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run(args)
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "data_root")}
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({
+            "createdAt": datetime.now().isoformat(),
+            "environment": environment(),
+            "config": config,
+            "results": results,
+        }, file, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
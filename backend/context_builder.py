@@ -0,0 +1,81 @@
+"""
+Context Builder
+---------------
+Formats the historical cases and conversation retrieved for a ticket into the
+context block of the agent prompts, within a token budget. Cases are kept
+whole in rank order while they fit; the conversation gets what is left and is
+condensed to its opening and closing lines when it is longer than that.
+Tokens are estimated at four characters each, which is close enough for the
+English text in tickets and transcripts to keep prompts inside the model's window.
+"""
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def format_case(ticket):
+    return (
+        f"Case #{ticket.get('Ticket ID', 'Unknown')}: "
+        f"{ticket.get('Issue Category', 'Unknown issue')} ({ticket.get('Sentiment', 'Unknown sentiment')}). "
+        f"Solution: {ticket.get('Solution', 'No solution recorded')}. "
+        f"Priority: {ticket.get('Priority', 'Unknown priority')}.\n"
+    )
+
+
+def build_context(cases, conversation, token_budget=None):
+    """Context block for the cases and conversation; None as the budget keeps everything"""
+    budget = float("inf") if token_budget is None else token_budget
+    context = ""
+
+    if cases:
+        header = "Historical similar cases:\n"
+        lines = []
+        used = estimate_tokens(header)
+        for case in cases:
+            line = format_case(case)
+            if used + estimate_tokens(line) > budget:
+                break
+            lines.append(line)
+            used += estimate_tokens(line)
+        if lines:
+            context = header + "".join(lines)
+
+    if conversation:
+        header = "\nRelated conversation example:\n"
+        remaining = budget - estimate_tokens(context + header)
+        if remaining > 0:
+            context += header + condense(conversation, remaining)
+
+    return context
+
+
+def condense(text, token_budget):
+    """Text cut to about token_budget tokens, keeping its first and last lines"""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    limit = int(token_budget * CHARS_PER_TOKEN)
+    lines = text.splitlines()
+    # Alternate between the opening, where the issue is described, and the end, where it is resolved
+    head, tail = [], []
+    start, end = 0, len(lines)
+    room = limit - 40  # the omission marker
+    while start < end:
+        from_head = len(head) <= len(tail)
+        line = lines[start] if from_head else lines[end - 1]
+        if len(line) + 1 > room:
+            break
+        room -= len(line) + 1
+        if from_head:
+            head.append(line)
+            start += 1
+        else:
+            tail.append(line)
+            end -= 1
+    if not head:
+        return text[:limit]
+    if start == end:
+        return "\n".join(head + tail[::-1])
+    return "\n".join(head + [f"[... {end - start} lines omitted ...]"] + tail[::-1])
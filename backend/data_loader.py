@@ -1,89 +1,610 @@
 import os
+import re
 import csv
+import io
 import json
+import heapq
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
 from pathlib import Path
+from context_builder import build_context
+from retrieval import BM25Index, tokenize
+from snapshot import load_snapshot, write_snapshot
+from ticket_store import CategoricalColumn, TicketStore
+
+DATA_DIR = os.environ.get("DATA_DIR")  # defaults to the data directory next to this module
+DATA_SNAPSHOT = os.environ.get("DATA_SNAPSHOT", "true").lower() == "true"
+DATA_SNAPSHOT_PATH = os.environ.get("DATA_SNAPSHOT_PATH")  # defaults to <data dir>/.cache/dataset.snap
+# For processes serving the same data directory (the pre-fork server's workers): new data is compiled
+# into the snapshot by one of them and mapped by all, instead of each indexing it in private memory
+DATA_SNAPSHOT_SHARED = os.environ.get("DATA_SNAPSHOT_SHARED", "false").lower() == "true"
+
+# Bytes kept from the end of the ingested CSV to tell an append from a rewrite
+CSV_TAIL_BYTES = 4096
+CONVERSATION_NAME = re.compile(r"\w[\w .-]*")
+
+class ConversationStore(Mapping):
+    """Conversation transcripts by category, read from disk on first access"""
+
+    def __init__(self, paths, bodies=None):
+        self.paths = paths  # category -> Path
+        self._bodies = dict(bodies or {})
+
+    def __getitem__(self, category):
+        body = self._bodies.get(category)
+        if body is None:
+            with open(self.paths[category], mode='r', encoding='utf-8') as file:
+                body = file.read()
+            self._bodies[category] = body
+        return body
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+class DataView:
+    """One consistent version of the loaded data and its indexes
+
+    Ingestion never changes a view in place: it builds the next one and swaps it
+    in, so a request that took a view keeps seeing the same rows and version.
+    """
+
+    def __init__(self, historical_tickets, ticket_index, conversations, conversation_names,
+                 conversation_index, field_index, date_runs, version=1):
+        self.historical_tickets = historical_tickets
+        self.ticket_index = ticket_index
+        self.conversations = conversations
+        self.conversation_names = conversation_names  # conversation index doc id -> category
+        self.conversation_index = conversation_index
+        self.field_index = field_index  # filter -> value -> sorted positions (may run past this view)
+        self.date_runs = date_runs  # sorted (dates, positions) runs: the loaded rows, then ingested ones
+        self.version = version  # counts the views this process has swapped in
+        self.fingerprint = None  # digest of the source data it was built from, part of response ETags
+
+    def find_ticket_positions(self, filters, date_from=None, date_to=None):
+        """Row positions matching every filter (ANDed, case-insensitive), in file order
+
+        filters maps names from DataLoader.FILTER_FIELDS to values; dates are inclusive ISO strings.
+        """
+        row_count = len(self.historical_tickets)
+        candidates = []
+        for field, value in filters.items():
+            if value:
+                positions = self.field_index[field].get(value.lower(), [])
+                candidates.append(positions[:bisect_left(positions, row_count)])
+        if date_from or date_to:
+            in_range = []
+            for dates, positions in self.date_runs:
+                lo = bisect_left(dates, date_from) if date_from else 0
+                hi = bisect_right(dates, date_to) if date_to else len(dates)
+                in_range.extend(positions[lo:hi])
+            candidates.append(sorted(in_range))
+
+        if not candidates:
+            return range(row_count)
+
+        # Walk the smallest list and probe the others
+        candidates.sort(key=len)
+        others = [set(positions) for positions in candidates[1:]]
+        return [p for p in candidates[0] if all(p in other for other in others)]
+
+    def find_similar_tickets(self, query, k=3):
+        """Return the k historical tickets that best match the query text"""
+        return [self.historical_tickets[doc_id] for doc_id, _ in self.ticket_index.search(query, k)]
+
+    def find_similar_conversation(self, query):
+        """Return the best matching conversation transcript, or None"""
+        hits = self.conversation_index.search(query, 1)
+        if not hits:
+            return None
+        return self.conversations[self.conversation_names[hits[0][0]]]
+
+    def get_combined_data_for_ticket(self, ticket, k=3, token_budget=None):
+        """Get relevant historical data and conversations for a ticket, within token_budget if given"""
+        query = f"{ticket['subject']} {ticket['description']}"
+
+        # Rank historical tickets and conversations against the ticket text
+        relevant_tickets = self.find_similar_tickets(query, k)
+        relevant_conversation = self.find_similar_conversation(query)
+
+        return build_context(relevant_tickets, relevant_conversation, token_budget)
 
 class DataLoader:
-    def __init__(self):
+    # Filter name -> CSV column (None: derived from the row by ticket_status)
+    FILTER_FIELDS = {
+        "status": None,
+        "category": "Issue Category",
+        "priority": "Priority",
+    }
+
+    def __init__(self, data_dir=None):
         """Initialize data loader and load historical ticket data and conversations"""
-        self.data_dir = Path(__file__).parent / "data"
-        self.historical_tickets = self._load_historical_tickets()
-        self.conversations = self._load_conversations()
-        print(f"Loaded {len(self.historical_tickets)} historical tickets and {len(self.conversations)} conversations")
+        self.data_dir = Path(data_dir or DATA_DIR or Path(__file__).parent / "data")
+        self.csv_path = self.data_dir / "Historical_ticket_data.csv"
+        self.snapshot_path = Path(DATA_SNAPSHOT_PATH or self.data_dir / ".cache" / "dataset.snap")
+        self._lock = threading.RLock()  # serializes ingestion; readers never take it
+        self._watcher = None
+        self._snapshot_stale = False  # the snapshot lags behind ingested data
+        self._snapshot_key = None  # identity of the snapshot file mapped last
+        self._shared = DATA_SNAPSHOT and DATA_SNAPSHOT_SHARED
+
+        self.view = self._load_snapshot() if DATA_SNAPSHOT else None
+        if self.view is not None:
+            source = "snapshot"
+        else:
+            source = "source files"
+            self.view = self._build_view()
+            self._write_snapshot()
+            if self._shared:
+                # Serve the mapping other processes can share rather than the private copy just built
+                self.view = self._load_snapshot() or self.view
+        self.view.fingerprint = self._fingerprint()
+        print(f"Loaded {len(self.historical_tickets)} historical tickets and {len(self.conversations)} conversations from {source}")
+
+    def __getattr__(self, name):
+        # Data and queries are served by the current view
+        if name == "view":
+            raise AttributeError(name)
+        return getattr(self.view, name)
+
+    def _source_paths(self, conversations):
+        """Files the loaded data is derived from, keyed by path relative to the data directory"""
+        paths = {}
+        if self.csv_path.exists():
+            paths[self.csv_path.name] = self.csv_path
+        for category, path in conversations.paths.items():
+            paths[f"Conversation/{path.name}"] = path
+        return paths
+
+    def _load_snapshot(self):
+        """Adopt the compiled snapshot if it was built from the current source files"""
+        key = self._snapshot_stat()
+        conversations = self._load_conversations()
+        snapshot = load_snapshot(self.snapshot_path, self._source_paths(conversations))
+        if snapshot is None or set(snapshot["conversation_names"]) != set(conversations):
+            return None
+        self._snapshot_buffer = snapshot.pop("buffer")  # keeps the mapping alive
+        self._snapshot_key = key
+        csv_source = snapshot.pop("sources").get(self.csv_path.name)
+        self._csv_offset = csv_source["size"] if csv_source else 0
+        self._csv_tail = self._read_csv_tail(self._csv_offset)
+        self._conversation_stamps = self._stamp_conversations(conversations)
+        return DataView(conversations=conversations, **snapshot)
+
+    def _write_snapshot(self):
+        """Compile the current view, unless the files on disk hold data it has not ingested"""
+        if not DATA_SNAPSHOT:
+            return
+        if self.csv_path.exists() and self.csv_path.stat().st_size != self._csv_offset:
+            return
+        try:
+            write_snapshot(self.snapshot_path, self._source_paths(self.view.conversations), self.view)
+            self._snapshot_stale = False
+        except OSError as e:
+            print(f"Could not write data snapshot: {e}")
+
+    def _build_view(self, version=1):
+        """Load everything from the source files"""
+        conversations = self._load_conversations()
+        tickets = self._load_historical_tickets()
+        names, conversation_index = self._build_conversation_index(conversations)
+        field_index, dates, date_positions = self._build_field_indexes(tickets)
+        self._conversation_stamps = self._stamp_conversations(conversations)
+        return DataView(
+            tickets, self._build_ticket_index(tickets), conversations, names, conversation_index,
+            field_index, [(dates, date_positions)], version
+        )
 
     def _load_historical_tickets(self):
-        """Load historical ticket data from CSV file"""
-        tickets = []
-        csv_path = self.data_dir / "Historical_ticket_data.csv"
-        
+        """Load historical ticket data from CSV file into a columnar TicketStore"""
+        self._csv_offset, self._csv_tail = 0, b""
+
         try:
-            with open(csv_path, mode='r', encoding='utf-8') as file:
-                csv_reader = csv.DictReader(file)
+            # utf-8-sig drops the byte order mark that would otherwise prefix "Ticket ID"
+            with open(self.csv_path, mode='r', encoding='utf-8-sig', newline='') as file:
+                csv_reader = csv.reader(file)
+                header = [name.strip() for name in next(csv_reader, [])]
+                tickets = TicketStore.empty(header)
                 for row in csv_reader:
-                    # Clean up the row data (remove whitespace from keys)
-                    clean_row = {k.strip(): v.strip() for k, v in row.items()}
-                    tickets.append(clean_row)
+                    if row:
+                        tickets.append(self._row_values(row, len(header)))
+                # Everything up to here is loaded; later appends are read from this offset
+                self._csv_offset = file.buffer.tell()
+            self._csv_tail = self._read_csv_tail(self._csv_offset)
             return tickets
         except Exception as e:
             print(f"Error loading historical tickets: {e}")
-            return []
+            return TicketStore({})
+
+    @staticmethod
+    def _row_values(row, width):
+        # Clean up the row data (remove whitespace), padding short rows
+        values = [value.strip() for value in row[:width]]
+        return values + [""] * (width - len(values))
+
+    def _read_csv_tail(self, offset):
+        """The last bytes of the CSV before offset"""
+        if offset == 0:
+            return b""
+        with open(self.csv_path, "rb") as file:
+            file.seek(max(0, offset - CSV_TAIL_BYTES))
+            return file.read(offset - file.tell())
 
     def _load_conversations(self):
-        """Load conversation examples from the Conversation directory"""
-        conversations = {}
+        """List conversation examples in the Conversation directory; bodies load on first access"""
         conv_dir = self.data_dir / "Conversation"
-        
+
         if not conv_dir.exists():
             print(f"Conversation directory not found: {conv_dir}")
-            return {}
-            
+            return ConversationStore({})
+
         try:
-            for file_path in conv_dir.glob("*.txt"):
-                category = file_path.stem
-                with open(file_path, mode='r', encoding='utf-8') as file:
-                    content = file.read()
-                    conversations[category] = content
-            return conversations
+            return ConversationStore({
+                file_path.stem: file_path for file_path in sorted(conv_dir.glob("*.txt"))
+            })
         except Exception as e:
             print(f"Error loading conversations: {e}")
-            return {}
-
-    def get_combined_data_for_ticket(self, ticket):
-        """Get relevant historical data and conversations for a ticket"""
-        # Simple keyword matching to find relevant tickets
-        keywords = ticket['subject'].lower().split() + ticket['description'].lower().split()
-        keywords = [k for k in keywords if len(k) > 3]  # Filter short words
-        
-        # Find relevant historical tickets
-        relevant_tickets = []
-        for hist_ticket in self.historical_tickets:
-            category = hist_ticket.get('Issue Category', '').lower()
-            if any(keyword in category for keyword in keywords):
-                relevant_tickets.append(hist_ticket)
-        
-        # Find relevant conversations
-        relevant_conversation = None
-        best_match_count = 0
-        for category, conversation in self.conversations.items():
-            category_lower = category.lower()
-            match_count = sum(1 for keyword in keywords if keyword in category_lower)
-            if match_count > best_match_count:
-                best_match_count = match_count
-                relevant_conversation = conversation
-        
-        # Combine the data
-        combined_data = ""
-        
-        if relevant_tickets:
-            combined_data += "Historical similar cases:\n"
-            for ticket in relevant_tickets[:3]:  # Limit to 3 most relevant
-                combined_data += f"Case #{ticket.get('Ticket ID', 'Unknown')}: "
-                combined_data += f"{ticket.get('Issue Category', 'Unknown issue')} ({ticket.get('Sentiment', 'Unknown sentiment')}). "
-                combined_data += f"Solution: {ticket.get('Solution', 'No solution recorded')}. "
-                combined_data += f"Priority: {ticket.get('Priority', 'Unknown priority')}.\n"
-        
-        if relevant_conversation:
-            combined_data += "\nRelated conversation example:\n"
-            combined_data += relevant_conversation
-        
-        return combined_data
+            return ConversationStore({})
+
+    @staticmethod
+    def _stamp_conversations(conversations):
+        stamps = {}
+        for category, path in conversations.paths.items():
+            stat = path.stat()
+            stamps[category] = (stat.st_size, stat.st_mtime_ns)
+        return stamps
+
+    @staticmethod
+    def _ticket_tokens(ticket):
+        """Index terms of a historical ticket: category (weighted twice) and solution"""
+        category = tokenize(ticket.get('Issue Category', ''))
+        return category + category + tokenize(ticket.get('Solution', ''))
+
+    @staticmethod
+    def _conversation_tokens(category, conversation):
+        """Index terms of a conversation: category name (weighted twice) and transcript"""
+        name_tokens = tokenize(category)
+        return name_tokens + name_tokens + tokenize(conversation)
+
+    def _build_ticket_index(self, tickets):
+        """Index historical tickets for retrieval"""
+        index = BM25Index()
+        for ticket in tickets:
+            index.add(self._ticket_tokens(ticket))
+        return index
+
+    def _build_conversation_index(self, conversations):
+        """Index conversations for retrieval"""
+        index = BM25Index()
+        names = []
+        for category, conversation in conversations.items():
+            index.add(self._conversation_tokens(category, conversation))
+            names.append(category)
+        return names, index
+
+    def _build_field_indexes(self, store):
+        """Index row positions by status, category and priority, and sort them by date"""
+        field_index = {}
+        for field, column in self.FILTER_FIELDS.items():
+            source = store.columns.get(column or "Resolution Status")
+            field_index[field] = {}
+            if not isinstance(source, CategoricalColumn):
+                continue
+
+            # Group rows by their integer code in one pass, then name each group
+            by_code = [[] for _ in source.values]
+            for position, code in enumerate(source.codes):
+                by_code[code].append(position)
+            for value, positions in zip(source.values, by_code):
+                field_index[field].setdefault(self._field_key(column, value), []).extend(positions)
+            for key, positions in field_index[field].items():
+                positions.sort()
+
+        date_of = lambda position: store[position].get('Date of Resolution', '')
+        date_positions = sorted(range(len(store)), key=date_of)
+        dates = [date_of(position) for position in date_positions]
+        return field_index, dates, date_positions
+
+    def _field_key(self, column, value):
+        """Filter index key of a column value"""
+        return self.ticket_status({"Resolution Status": value}) if column is None else value.lower()
+
+    @staticmethod
+    def ticket_status(ticket):
+        """Support ticket status of a historical row, as shown by /tickets"""
+        return "resolved" if ticket.get("Resolution Status", "").lower() == "resolved" else "new"
+
+    def ingest(self, tickets=(), conversations=None):
+        """Append tickets to the CSV and save new conversation files, then refresh
+
+        tickets are dicts keyed by CSV column; conversations map a new category
+        name to its transcript. Raises ValueError for input that cannot be stored.
+        """
+        conversations = conversations or {}
+        with self._lock:
+            if not isinstance(tickets, (list, tuple)) or not isinstance(conversations, dict):
+                raise ValueError("tickets must be a list and conversations an object")
+            columns = list(self.view.historical_tickets.columns)
+            if tickets and not columns:
+                raise ValueError("There is no historical ticket CSV to append to")
+            for ticket in tickets:
+                if not isinstance(ticket, dict):
+                    raise ValueError("Each ticket must be an object keyed by CSV column")
+            for name, transcript in conversations.items():
+                if not CONVERSATION_NAME.fullmatch(name) or not isinstance(transcript, str):
+                    raise ValueError(f"Invalid conversation: {name!r}")
+                if name in self.view.conversations:
+                    raise ValueError(f"Conversation already exists: {name!r}")
+
+            if tickets:
+                self._append_csv_rows(
+                    [[str(ticket.get(column, "")) for column in columns] for ticket in tickets]
+                )
+            conv_dir = self.data_dir / "Conversation"
+            for name, transcript in conversations.items():
+                conv_dir.mkdir(parents=True, exist_ok=True)
+                # Written aside and renamed, so a concurrent scan never sees half a file
+                tmp_path = conv_dir / f"{name}.txt.tmp"
+                tmp_path.write_text(transcript, encoding="utf-8")
+                os.replace(tmp_path, conv_dir / f"{name}.txt")
+            return self.refresh()
+
+    def _append_csv_rows(self, rows):
+        needs_newline = False
+        with open(self.csv_path, "rb") as file:
+            if file.seek(0, os.SEEK_END) > 0:
+                file.seek(-1, os.SEEK_END)
+                needs_newline = file.read(1) != b"\n"
+        with open(self.csv_path, "a", encoding="utf-8", newline="") as file:
+            if needs_newline:
+                file.write("\n")
+            csv.writer(file, lineterminator="\n").writerows(rows)
+
+    def refresh(self):
+        """Ingest rows appended to the CSV and new conversation files, and swap in the result
+
+        Appends are indexed incrementally. A rewritten CSV is reloaded in full, and
+        changed or removed conversations are reindexed; either way requests keep
+        being answered from the previous view until the new one is swapped in.
+        Returns the change in ticket and conversation counts.
+
+        With DATA_SNAPSHOT_SHARED, the new data is compiled into the snapshot and
+        the snapshot is mapped instead, see _refresh_shared.
+        """
+        with self._lock:
+            if self._shared:
+                return self._refresh_shared()
+            return self._refresh_view()
+
+    def _refresh_view(self):
+        """Bring the view up to date with the data directory in this process's memory"""
+        with self._lock:
+            view = self.view
+            if not self._csv_appended_only(view):
+                reloaded = self._build_view(view.version + 1)
+                reloaded.fingerprint = self._fingerprint()
+                self.view = reloaded
+                changes = self._report(view, reloaded=True)
+                self._write_snapshot()
+                return changes
+
+            rows, offset = self._read_new_rows(len(view.historical_tickets.columns))
+            conversations = self._load_conversations()
+            stamps = self._stamp_conversations(conversations)
+            if not rows and stamps == self._conversation_stamps:
+                # Recompile the snapshot once ingestion has gone quiet, not after every append
+                if self._snapshot_stale:
+                    self._write_snapshot()
+                return {"tickets": 0, "conversations": 0, "reloaded": False}
+
+            extended = self._extend_view(view, rows, conversations, stamps)
+            self._csv_offset, self._csv_tail = offset, self._read_csv_tail(offset)
+            self._conversation_stamps = stamps
+            extended.fingerprint = self._fingerprint()
+            self.view = extended
+            self._snapshot_stale = True
+            return self._report(view, reloaded=False)
+
+    def _refresh_shared(self):
+        """Map the latest snapshot, compiling it first if the data directory has moved past it
+
+        One process at a time, holding a lock file next to the snapshot, indexes
+        the new data and rewrites the snapshot; every process, itself included,
+        then maps the new file. The data stays in page cache shared by all of them
+        instead of being copied into each one's memory when it changes.
+        """
+        unchanged = {"tickets": 0, "conversations": 0, "reloaded": False}
+        changes = self._adopt_snapshot()
+        if changes is not None or not self._sources_changed():
+            return changes or unchanged
+        with self._compile_lock():
+            # Another process may have compiled it while this one waited for the lock
+            changes = self._adopt_snapshot()
+            if changes is not None or not self._sources_changed():
+                return changes or unchanged
+            previous = self.view
+            changes = self._refresh_view()
+            self._write_snapshot()
+            if self._adopt_snapshot(previous) is None:
+                print("Serving ingested data from memory until the snapshot can be rewritten")
+            return changes
+
+    def _adopt_snapshot(self, previous=None):
+        """Swap in the snapshot file if it was replaced and matches the data directory; returns the changes or None"""
+        key = self._snapshot_stat()
+        if key is None or key == self._snapshot_key:
+            return None
+        previous = previous or self.view
+        view = self._load_snapshot()
+        if view is None:
+            self._snapshot_key = key  # stale; wait for a newer file rather than reading this one again
+            return None
+        view.version = self.view.version + 1
+        view.fingerprint = self._fingerprint()
+        self.view = view
+        self._snapshot_stale = False
+        return self._report(previous, reloaded=True)
+
+    def _snapshot_stat(self):
+        try:
+            stat = os.stat(self.snapshot_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _sources_changed(self):
+        """Whether the data directory holds data the current view has not ingested"""
+        size = self.csv_path.stat().st_size if self.csv_path.exists() else 0
+        if size != self._csv_offset or not self._csv_appended_only(self.view):
+            return True
+        return self._stamp_conversations(self._load_conversations()) != self._conversation_stamps
+
+    @contextmanager
+    def _compile_lock(self):
+        import fcntl  # POSIX only, like the pre-fork server that shares snapshots
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{self.snapshot_path}.lock", "a") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)  # released when the file is closed
+            yield
+
+    def _fingerprint(self):
+        """Digest of the ingested CSV bytes and conversation files
+
+        Unlike the view version it is the same in every process, and after a
+        restart, that has loaded the same files, so it can go into ETags.
+        """
+        digest = hashlib.sha1(str(self._csv_offset).encode())
+        digest.update(self._csv_tail)
+        digest.update(json.dumps(sorted(self._conversation_stamps.items())).encode())
+        return digest.hexdigest()[:16]
+
+    def _report(self, previous, reloaded):
+        changes = {
+            "tickets": len(self.view.historical_tickets) - len(previous.historical_tickets),
+            "conversations": len(self.view.conversations) - len(previous.conversations),
+            "reloaded": reloaded,
+        }
+        print(f"Data version {self.view.version}: {changes['tickets']:+d} historical tickets, "
+              f"{changes['conversations']:+d} conversations{' (full reload)' if reloaded else ''}")
+        return changes
+
+    def _csv_appended_only(self, view):
+        """Whether the CSV still starts with exactly the bytes already ingested"""
+        if not self.csv_path.exists():
+            return self._csv_offset == 0
+        if not view.historical_tickets.columns:
+            return False  # the CSV appeared after startup; its header has to be read
+        if self.csv_path.stat().st_size < self._csv_offset:
+            return False
+        return self._read_csv_tail(self._csv_offset) == self._csv_tail
+
+    def _read_new_rows(self, width):
+        """Complete rows written after the ingested offset, and the offset past them"""
+        if not self.csv_path.exists():
+            return [], self._csv_offset
+        with open(self.csv_path, "rb") as file:
+            file.seek(self._csv_offset)
+            data = file.read()
+        # A row still being written has no line break yet; it is picked up next time
+        data = data[:data.rfind(b"\n") + 1]
+        rows = [
+            self._row_values(row, width)
+            for row in csv.reader(io.StringIO(data.decode("utf-8"), newline=""))
+            if row
+        ]
+        return rows, self._csv_offset + len(data)
+
+    def _extend_view(self, view, rows, conversations, stamps):
+        """Next view: view plus the new rows, and the given conversations"""
+        tickets = view.historical_tickets
+        ticket_index = view.ticket_index
+        field_index = view.field_index
+        date_runs = view.date_runs
+        if rows:
+            first = len(tickets)
+            tickets = tickets.fork()
+            for values in rows:
+                tickets.append(values)
+            ticket_index = ticket_index.fork()
+            for position in range(first, len(tickets)):
+                ticket_index.add(self._ticket_tokens(tickets[position]))
+            field_index = self._extend_field_indexes(field_index, tickets, first)
+            date_runs = self._extend_date_runs(date_runs, tickets, first)
+
+        previous = view.conversations
+        names, conversation_index = view.conversation_names, view.conversation_index
+        if any(stamps.get(name) != stamp for name, stamp in self._conversation_stamps.items()):
+            # A transcript changed or went away; conversations are few, so reindex them all
+            names, conversation_index = self._build_conversation_index(conversations)
+        elif len(stamps) > len(self._conversation_stamps):
+            added = [name for name in conversations if name not in previous]
+            conversations = ConversationStore(
+                {**previous.paths, **{name: conversations.paths[name] for name in added}},
+                previous._bodies
+            )
+            names, conversation_index = names + added, conversation_index.fork()
+            for name in added:
+                conversation_index.add(self._conversation_tokens(name, conversations[name]))
+        else:
+            conversations = previous
+
+        return DataView(
+            tickets, ticket_index, conversations, names, conversation_index,
+            field_index, date_runs, view.version + 1
+        )
+
+    def _extend_field_indexes(self, field_index, tickets, first):
+        """Filter indexes with the rows from first on added
+
+        Position lists are shared with the previous view, which ignores positions
+        past its own rows; lists still backed by the snapshot are copied first.
+        """
+        extended = {}
+        for field, column in self.FILTER_FIELDS.items():
+            by_value = dict(field_index[field])
+            source = tickets.columns.get(column or "Resolution Status")
+            if isinstance(source, CategoricalColumn):
+                for position in range(first, len(tickets)):
+                    key = self._field_key(column, source[position])
+                    positions = by_value.get(key)
+                    if not isinstance(positions, list):
+                        positions = by_value[key] = list(positions or [])
+                    positions.append(position)
+            extended[field] = by_value
+        return extended
+
+    @staticmethod
+    def _extend_date_runs(date_runs, tickets, first):
+        """Date runs with the rows from first on merged into the ingested run"""
+        added = sorted(
+            (tickets[position].get('Date of Resolution', ''), position)
+            for position in range(first, len(tickets))
+        )
+        if len(date_runs) > 1:
+            added = list(heapq.merge(zip(*date_runs[1]), added))
+        return [date_runs[0], ([date for date, _ in added], [position for _, position in added])]
+
+    def watch(self, interval):
+        """Check the data directory for new data every interval seconds, in a background thread"""
+        if self._watcher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Error refreshing data: {e}")
+
+        self._watcher = threading.Thread(target=run, name="data-watcher", daemon=True)
+        self._watcher.start()
+
+    def watching(self):
+        return self._watcher is not None and self._watcher.is_alive()
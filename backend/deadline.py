@@ -0,0 +1,64 @@
+"""
+Deadlines
+---------
+Time limit of the request an agent call is made for. The request sets it with
+deadline_scope; AgentPool carries it to the worker running each call, where the
+LLM clients cap their timeouts with bounded() so a call never outlives it.
+Calls that miss it are answered with timed_out() instead of an error.
+"""
+
+import time
+import contextvars
+from contextlib import contextmanager
+
+# time.monotonic() value by which the current request must answer, or None
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when there is no time left before the deadline to start or continue a call"""
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Make deadline (a time.monotonic() value, or None for no limit) apply to this block"""
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def after(milliseconds):
+    """Deadline milliseconds from now"""
+    return time.monotonic() + milliseconds / 1000
+
+
+def current():
+    return _deadline.get()
+
+
+def remaining():
+    """Seconds left before the current deadline, or None without one"""
+    deadline = current()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired():
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def bounded(timeout):
+    """timeout cut to the time left, raising DeadlineExceeded when none is"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("The request deadline has passed")
+    return left if timeout is None else min(timeout, left)
+
+
+def timed_out():
+    """Result of an agent call that missed the deadline"""
+    return {"timedOut": True}
@@ -0,0 +1,221 @@
+"""
+Bulk Enrichment
+---------------
+Offline pass over a historical ticket CSV (the Historical_ticket_data.csv format)
+that appends sentiment, emotion and intensity scores from SentimentAnalyzerAgent
+and the retrieval keys the ticket is indexed under. The input is read in chunks
+of whole records (quoted fields may span lines), the chunks are analyzed across
+a process pool, and the enriched
+rows are appended to the output in input order, so memory stays flat however
+large the file. After every chunk the input offset reached is saved next to the
+output; --resume continues from there after an interruption.
+
+    cd backend
+    python -m enrich data/Historical_ticket_data.csv --output enriched.csv --workers 8
+    python -m enrich data/Historical_ticket_data.csv --output enriched.csv --resume
+"""
+
+import io
+import os
+import csv
+import json
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from agents.sentiment_analyzer import SentimentAnalyzerAgent
+from retrieval import tokenize
+
+ENRICHED_COLUMNS = [
+    "Overall Sentiment", "Sentiment Confidence", "Intensity", "Primary Emotion", "Emotion Scores", "Retrieval Keys",
+]
+
+# Set in each worker process by init_worker
+_analyzer = None
+_columns = None
+
+
+def init_worker(header, subject_column, description_column):
+    global _analyzer, _columns
+    _analyzer = SentimentAnalyzerAgent()
+    _columns = (len(header), header.index(subject_column), header.index(description_column))
+
+
+def enrich_chunk(data):
+    """Enriched CSV bytes and the row count for a chunk of whole CSV records"""
+    width, subject, description = _columns
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    rows = 0
+    for row in csv.reader(io.StringIO(data.decode("utf-8"), newline="")):
+        if not row:
+            continue
+        values = [value.strip() for value in row[:width]]
+        values += [""] * (width - len(values))
+        writer.writerow(values + enrich_values(values[subject], values[description]))
+        rows += 1
+    return output.getvalue().encode("utf-8"), rows
+
+
+def enrich_values(subject, description):
+    """Values of ENRICHED_COLUMNS for one ticket"""
+    analysis = _analyzer.analyze_with_confidence({"subject": subject, "description": description})
+    emotions = {emotion: score for emotion, score in analysis["emotions"].items() if score > 0}
+    primary = max(emotions, key=emotions.get) if emotions else "none"
+    keys = dict.fromkeys(tokenize(f"{subject} {description}"))  # distinct, in order of appearance
+    return [
+        analysis["overall_sentiment"],
+        analysis["confidence"],
+        analysis["intensity"],
+        primary,
+        json.dumps(emotions, sort_keys=True),
+        " ".join(keys),
+    ]
+
+
+def read_header(path):
+    """Column names of the input and the offset of its first row"""
+    with open(path, "rb") as file:
+        line = file.readline()
+        offset = file.tell()
+    # utf-8-sig drops the byte order mark that would otherwise prefix "Ticket ID"
+    header = next(csv.reader([line.decode("utf-8-sig")]), [])
+    return [name.strip() for name in header], offset
+
+
+def read_records(path, offset):
+    """Yield (record bytes, offset after it) for each CSV record from offset on
+
+    A line ends the record unless it leaves a quoted field open; with quotes
+    escaped by doubling, that is when the record so far has an odd number of them.
+    """
+    with open(path, "rb") as file:
+        file.seek(offset)
+        lines, quotes = [], 0
+        for line in file:
+            lines.append(line)
+            offset += len(line)
+            quotes += line.count(b'"')
+            if quotes % 2 == 0:
+                yield b"".join(lines), offset
+                lines, quotes = [], 0
+        if lines:
+            yield b"".join(lines), offset
+
+
+def record_start(path, first_row, offset):
+    """Offset of the first record that starts at or after offset"""
+    # Whether an offset is inside a quoted field depends on everything before it
+    position = first_row
+    for _, end in read_records(path, first_row):
+        if position >= offset:
+            break
+        position = end
+    return position
+
+
+def read_chunks(path, offset, chunk_rows):
+    """Yield (chunk bytes, offset after it) of up to chunk_rows records from offset on"""
+    records = []
+    for record, end in read_records(path, offset):
+        records.append(record)
+        if len(records) == chunk_rows:
+            yield b"".join(records), end
+            records = []
+    if records:
+        yield b"".join(records), end
+
+
+def progress_path(output_path):
+    return f"{output_path}.progress"
+
+
+def load_progress(output_path):
+    try:
+        with open(progress_path(output_path), encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_progress(output_path, progress):
+    # Replaced atomically, so an interruption leaves the previous checkpoint intact
+    temporary = f"{progress_path(output_path)}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(progress, file)
+    os.replace(temporary, progress_path(output_path))
+
+
+def enrich(input_path, output_path, workers, chunk_rows, subject_column, description_column,
+           resume=False, start_offset=None):
+    """Enrich input_path into output_path; returns the rows written and the seconds taken"""
+    header, first_row = read_header(input_path)
+    for column in (subject_column, description_column):
+        if column not in header:
+            raise ValueError(f"Column {column!r} not in {input_path}; columns are {', '.join(header)}")
+
+    progress = load_progress(output_path) if resume else None
+    if progress is not None:
+        # Drop anything written after the last checkpoint, then carry on from its offset
+        with open(output_path, "r+b") as output:
+            output.truncate(progress["outputSize"])
+        offset, done = progress["inputOffset"], progress["rows"]
+        print(f"Resuming at byte {offset} of {input_path}, after {done} rows")
+    else:
+        if resume:
+            print(f"No progress saved for {output_path}; starting from the beginning")
+        offset, done = record_start(input_path, first_row, start_offset or 0), 0
+        with open(output_path, "w", encoding="utf-8", newline="") as output:
+            csv.writer(output, lineterminator="\n").writerow(header + ENRICHED_COLUMNS)
+
+    rows = 0
+    started = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, init_worker, (header, subject_column, description_column)) as pool, \
+            open(output_path, "ab") as output:
+        pending = deque()  # (async result, input offset after its chunk), in input order
+
+        def write_next():
+            nonlocal rows
+            result, end_offset = pending.popleft()
+            data, count = result.get()
+            output.write(data)
+            output.flush()
+            rows += count
+            save_progress(output_path, {"inputOffset": end_offset, "outputSize": output.tell(), "rows": done + rows})
+            seconds = time.perf_counter() - started
+            print(f"{done + rows} rows, {rows / seconds:.0f} rows/s")
+
+        # A few chunks per worker in flight keeps every core busy without reading ahead unboundedly
+        for data, end_offset in read_chunks(input_path, offset, chunk_rows):
+            pending.append((pool.apply_async(enrich_chunk, (data,)), end_offset))
+            if len(pending) >= workers * 2:
+                write_next()
+        while pending:
+            write_next()
+
+    return rows, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add sentiment, emotion and retrieval keys to a historical ticket CSV")
+    parser.add_argument("input", nargs="?", default=os.path.join("data", "Historical_ticket_data.csv"))
+    parser.add_argument("--output", help="enriched CSV (default: <input>_enriched.csv)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=5000, help="rows per unit of work sent to a worker")
+    parser.add_argument("--subject-column", default="Issue Category", help="column analyzed as the ticket subject")
+    parser.add_argument("--description-column", default="Solution", help="column analyzed as the ticket description")
+    parser.add_argument("--resume", action="store_true", help="continue from the offset saved by an earlier run")
+    parser.add_argument("--start-offset", type=int, help="byte offset to start from (the next record if mid-record)")
+    args = parser.parse_args()
+
+    output = args.output or f"{os.path.splitext(args.input)[0]}_enriched.csv"
+    rows, seconds = enrich(
+        args.input, output, args.workers, args.chunk_rows, args.subject_column, args.description_column,
+        args.resume, args.start_offset
+    )
+    print(f"Enriched {rows} rows in {seconds:.1f}s ({rows / seconds if seconds else 0:.0f} rows/s) into {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Fused Analysis
+--------------
+Asks the model for the requested agent sections (all six by default) in one
+schema-constrained generation, so the ticket and its historical context are only
+processed once, and checks each returned section so that only the broken ones
+need a per-agent retry.
+"""
+
+from agent_prompts import AGENT_INSTRUCTIONS, shared_prefix
+from context_builder import estimate_tokens
+
+FUSED_INTRO = "You are a team of customer support specialists analyzing one support ticket.\n\n"
+
+_STRING = {"type": "string"}
+_NUMBER = {"type": "number"}
+_PRIORITY = {"type": "string", "enum": ["low", "medium", "high"]}
+
+# Shapes follow the agent types the frontend renders
+SECTION_SCHEMAS = {
+    "summary": {
+        "type": "object",
+        "properties": {
+            "summary": _STRING,
+            "keyPoints": {"type": "array", "items": _STRING, "minItems": 1},
+            "sentiment": {"type": "string", "enum": ["positive", "neutral", "negative"]},
+        },
+        "required": ["summary", "keyPoints", "sentiment"],
+    },
+    "actions": {
+        "type": "object",
+        "properties": {
+            "actions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"type": _STRING, "priority": _PRIORITY, "description": _STRING},
+                    "required": ["type", "priority", "description"],
+                },
+                "minItems": 1,
+            },
+        },
+        "required": ["actions"],
+    },
+    "routing": {
+        "type": "object",
+        "properties": {
+            "recommendedTeam": _STRING,
+            "confidence": _NUMBER,
+            "reasoning": _STRING,
+        },
+        "required": ["recommendedTeam", "reasoning"],
+    },
+    "sentiment": {
+        "type": "object",
+        "properties": {
+            "overallSentiment": _STRING,
+            "tone": _STRING,
+            "emotions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"emotion": _STRING, "intensity": _STRING},
+                    "required": ["emotion", "intensity"],
+                },
+            },
+        },
+        "required": ["overallSentiment", "emotions"],
+    },
+    "recommendations": {
+        "type": "object",
+        "properties": {
+            "suggestedResolutions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "title": _STRING,
+                        "steps": {"type": "array", "items": _STRING},
+                        "confidence": _NUMBER,
+                    },
+                    "required": ["title", "steps"],
+                },
+                "minItems": 1,
+            },
+        },
+        "required": ["suggestedResolutions"],
+    },
+    "timeEstimation": {
+        "type": "object",
+        "properties": {
+            "estimatedMinutes": _NUMBER,
+            "confidence": _NUMBER,
+            "factors": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"name": _STRING, "impact": _NUMBER},
+                    "required": ["name"],
+                },
+            },
+        },
+        "required": ["estimatedMinutes", "factors"],
+    },
+}
+
+def fused_schema(names=None):
+    """Schema of a fused response with the sections of names, or of every agent"""
+    names = list(SECTION_SCHEMAS) if names is None else list(names)
+    return {
+        "type": "object",
+        "properties": {name: SECTION_SCHEMAS[name] for name in names},
+        "required": names,
+    }
+
+
+def fused_tasks(names):
+    """End of a fused prompt: the instructions of the agents in names"""
+    tasks = "\n\n".join(
+        f'"{name}" ({AGENT_INSTRUCTIONS[name][0]}):\n{AGENT_INSTRUCTIONS[name][1]}'
+        for name in names
+    )
+    return f"""
+Complete each of the following tasks and put each answer under its key:
+
+{tasks}
+
+Format your response as a single valid JSON object with the keys {", ".join(names)}."""
+
+
+def fused_instruction_tokens(names):
+    """Room a fused prompt for names needs besides the ticket and context, for context_budget"""
+    return estimate_tokens(FUSED_INTRO + fused_tasks(names))
+
+
+def build_fused_prompt(ticket, historical_context, names=None):
+    """Build one prompt that covers the instructions of the agents in names, or of every agent
+
+    The ticket is condensed like in the agent prompts, leaving room for all the instructions.
+    """
+    names = list(SECTION_SCHEMAS) if names is None else list(names)
+    prefix = shared_prefix(ticket, historical_context, fused_instruction_tokens(names))
+    return FUSED_INTRO + prefix + fused_tasks(names)
+
+
+def split_sections(response, names=None):
+    """Split a fused response into the sections of names that validate and the names that do not"""
+    valid = {}
+    failed = []
+    for name in (SECTION_SCHEMAS if names is None else names):
+        section = response.get(name) if isinstance(response, dict) else None
+        if matches_schema(section, SECTION_SCHEMAS[name]):
+            valid[name] = section
+        else:
+            failed.append(name)
+    return valid, failed
+
+
+def matches_schema(value, schema):
+    """Check a value against the small JSON-schema subset used above"""
+    expected = schema.get("type")
+    if expected == "object":
+        if not isinstance(value, dict):
+            return False
+        if any(key not in value for key in schema.get("required", [])):
+            return False
+        return all(
+            matches_schema(value[key], sub_schema)
+            for key, sub_schema in schema.get("properties", {}).items()
+            if key in value
+        )
+    if expected == "array":
+        if not isinstance(value, list) or len(value) < schema.get("minItems", 0):
+            return False
+        return all(matches_schema(item, schema.get("items", {})) for item in value)
+    if expected == "string":
+        if not isinstance(value, str):
+            return False
+        return "enum" not in schema or value.lower() in schema["enum"]
+    if expected == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return True
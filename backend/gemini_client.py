@@ -0,0 +1,86 @@
+"""
+Gemini Client
+-------------
+Shared client for the Gemini API. The SDK is configured and the model built once
+per process. Every call carries a timeout, and calls rejected for rate limiting
+are retried with exponential backoff, as long as the request deadline leaves time
+for it. Sync and asyncio entry points are provided.
+"""
+
+import os
+import time
+import random
+import asyncio
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from deadline import DeadlineExceeded, bounded, remaining
+from metrics import record_tokens
+
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-pro")
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", "60"))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF = float(os.environ.get("GEMINI_BACKOFF", "1.0"))
+
+RATE_LIMIT_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+
+class GeminiClient:
+    def __init__(self, api_key, model_name=GEMINI_MODEL, timeout=GEMINI_TIMEOUT,
+                 max_retries=GEMINI_MAX_RETRIES, backoff=GEMINI_BACKOFF):
+        """Configure the SDK and build the model once"""
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def generate(self, prompt, timeout=None):
+        """Generate a reply and return its text, retrying when rate limited"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.model.generate_content(
+                    prompt, request_options={"timeout": bounded(timeout or self.timeout)}
+                )
+                return self._text(response)
+            except RATE_LIMIT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+
+    async def generate_async(self, prompt, timeout=None):
+        """Async version of generate, which does not hold a thread while waiting"""
+        for attempt in range(self.max_retries + 1):
+            attempt_timeout = bounded(timeout or self.timeout)
+            try:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, request_options={"timeout": attempt_timeout}),
+                    attempt_timeout
+                )
+                return self._text(response)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Gemini did not answer within {attempt_timeout:.1f} seconds")
+            except RATE_LIMIT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+
+    @staticmethod
+    def _text(response):
+        if not response:
+            return ""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            record_tokens(usage.prompt_token_count, usage.candidates_token_count)
+        return response.text
+
+    def _backoff(self, attempt):
+        """Delay before the next retry, raising DeadlineExceeded if the deadline would pass first"""
+        delay = self._delay(attempt)
+        left = remaining()
+        if left is not None and left <= delay:
+            raise DeadlineExceeded("No time left before the request deadline to retry Gemini")
+        return delay
+
+    def _delay(self, attempt):
+        # Exponential backoff with jitter so concurrent retries spread out
+        return self.backoff * (2 ** attempt) * (1 + random.random() / 2)
@@ -0,0 +1,65 @@
+"""
+Pre-fork Server
+---------------
+Gunicorn settings for serving the API with several worker processes:
+
+    cd backend
+    gunicorn
+
+The app is imported once in the parent (preload_app), so the ticket data,
+retrieval indexes and sentiment lexicons are loaded a single time and every
+worker shares them copy-on-write. The snapshot sections are a read-only file
+mapping and are shared through the page cache whatever the workers touch. The
+garbage collector stays off while the app loads and the loaded objects are then
+frozen, so collections in the workers do not write to the shared pages. Each
+worker starts its own threads and connections after the fork (app.start_worker).
+
+New data (POST /ingest or the data directory watcher) is not indexed into each
+worker's memory, which would give every worker a private copy from the first
+ingest on. With DATA_SNAPSHOT_SHARED, the first worker to notice it takes a lock
+next to the snapshot, compiles the snapshot again and maps the new file; the
+others map that file on their next watch tick (DATA_WATCH_INTERVAL), so until
+then they keep answering from the previous version of the data.
+"""
+
+import gc
+import os
+
+# Read by app.py when it is imported below
+os.environ["SERVER_PREFORK"] = "true"
+# Job states go to a file every worker can read, so any of them can answer a poll
+_data_dir = os.environ.get("DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+os.environ.setdefault("JOB_DB", os.path.join(_data_dir, ".cache", "jobs.sqlite3"))
+os.makedirs(os.path.dirname(os.environ["JOB_DB"]), exist_ok=True)
+# Ingested data is compiled into the snapshot, which every worker maps
+os.environ.setdefault("DATA_SNAPSHOT_SHARED", "true")
+
+wsgi_app = "app:app"
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+# Threads per worker; requests mostly wait on the LLM backends
+worker_class = "gthread"
+threads = int(os.environ.get("WORKER_THREADS", "8"))
+preload_app = True
+
+# Objects allocated while the app loads are not moved around by collections before the fork
+gc.disable()
+
+
+def when_ready(server):
+    gc.freeze()
+    gc.enable()
+
+
+def post_fork(server, worker):
+    import app
+    app.start_worker()
+
+
+def post_worker_init(worker):
+    import app
+    checks = app.worker_checks()
+    if all(checks.values()):
+        worker.log.info("Worker %s ready", worker.pid)
+    else:
+        worker.log.warning("Worker %s not ready: %s", worker.pid, checks)
@@ -0,0 +1,52 @@
+"""
+HTTP Caching Helpers
+--------------------
+Cursor pagination and conditional, compressed JSON responses for the read-only
+listing endpoints, so polling clients get 304s instead of the whole dataset.
+"""
+
+import gzip
+import json
+import base64
+import hashlib
+from flask import Response, request
+
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+GZIP_MIN_BYTES = 1024
+
+def encode_cursor(position):
+    """Opaque cursor pointing at a row position"""
+    return base64.urlsafe_b64encode(str(position).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Row position of a cursor; raises ValueError for a malformed one"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return int(base64.urlsafe_b64decode(padded.encode()).decode())
+
+def page_size(args):
+    """Requested page size, clamped to MAX_PAGE_SIZE"""
+    return max(1, min(int(args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+
+def make_etag(fingerprint, args):
+    """ETag for a data fingerprint and the query that selects from it"""
+    query = "&".join(f"{key}={value}" for key, value in sorted(args.items(multi=True)))
+    return f"{fingerprint}-{hashlib.sha1(query.encode()).hexdigest()[:16]}"
+
+def conditional_json(etag, build_payload):
+    """304 if the client already has this ETag, otherwise the (gzipped) JSON payload
+
+    build_payload is only called when the body is actually needed.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        body = json.dumps(build_payload()).encode("utf-8")
+        response = Response(body, mimetype="application/json")
+        if "gzip" in request.accept_encodings and len(body) >= GZIP_MIN_BYTES:
+            response.set_data(gzip.compress(body, compresslevel=5))
+            response.headers["Content-Encoding"] = "gzip"
+    # Weak, because the gzipped and plain bodies of a representation differ in bytes
+    response.set_etag(etag, weak=True)
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
@@ -0,0 +1,226 @@
+"""
+Job Queue
+---------
+Bounded, prioritized queue of ticket analyses run by a fixed set of worker
+threads, so a burst of tickets waits in the queue instead of holding HTTP
+workers. Jobs are taken strictly by lane (ticket priority), then in arrival
+order. LLM concurrency stays capped by the AgentPool the workers call into.
+Finished jobs are kept for polling until their result TTL passes. With a
+db_path, job states are also written to SQLite, so when several server
+processes share the file any of them can answer a poll.
+"""
+
+import json
+import math
+import time
+import uuid
+import heapq
+import sqlite3
+import itertools
+import threading
+from collections import deque
+from metrics import JOBS, JOB_WAIT_SECONDS
+
+# Ticket priority -> lane; lower lanes are served first
+PRIORITY_LANES = {"critical": 0, "urgent": 0, "high": 1, "medium": 2, "low": 3}
+DEFAULT_LANE = PRIORITY_LANES["medium"]
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when no more jobs can be queued"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full; retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, payload, lane, sequence):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.lane = lane
+        self.sequence = sequence
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @classmethod
+    def from_row(cls, row):
+        """Job as saved in the jobs table by another process"""
+        job_id, status, lane, created_at, started_at, finished_at, result, error = row
+        job = cls(None, lane, None)
+        job.id, job.status = job_id, status
+        job.created_at, job.started_at, job.finished_at = created_at, started_at, finished_at
+        job.result = json.loads(result) if result is not None else None
+        job.error = error
+        return job
+
+    def to_dict(self):
+        job = {
+            "jobId": self.id,
+            "status": self.status,
+            "lane": self.lane,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+        }
+        if self.status == "completed":
+            job["result"] = self.result
+        elif self.status == "failed":
+            job["error"] = self.error
+        return job
+
+
+class JobQueue:
+    def __init__(self, process_fn, workers=4, max_queued=100, result_ttl=3600, db_path=None):
+        """Queue for workers that call process_fn(payload) for each job, at most max_queued waiting
+
+        Nothing runs until start(), so the queue can be built before a fork.
+        """
+        self.process_fn = process_fn
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.db_path = db_path
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._heap = []  # (lane, sequence, job)
+        self._sequence = itertools.count()
+        self._jobs = {}  # id -> Job, until the result expires
+        self._finished = deque()  # finished jobs, oldest first
+        self._condition = threading.Condition()
+        self._average_seconds = None  # moving average of job run time, for Retry-After
+        self._threads = []
+
+    def start(self):
+        """Open the job database and start the worker threads"""
+        if self._threads:
+            return
+        if self.db_path:
+            self._db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")  # polls from other processes do not block writers
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, lane INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, result TEXT, error TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+            self._db.commit()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def alive(self):
+        """Whether every worker thread is running"""
+        return bool(self._threads) and all(thread.is_alive() for thread in self._threads)
+
+    @staticmethod
+    def lane_for(ticket):
+        """Lane of a ticket from its priority field"""
+        return PRIORITY_LANES.get(str(ticket.get("priority", "")).lower(), DEFAULT_LANE)
+
+    def submit(self, payload, lane=DEFAULT_LANE):
+        """Queue a job and return it; raises QueueFull when max_queued jobs are waiting"""
+        with self._condition:
+            self._expire()
+            if len(self._heap) >= self.max_queued:
+                JOBS.inc(status="rejected")
+                raise QueueFull(self._retry_after())
+            job = Job(payload, lane, next(self._sequence))
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (lane, job.sequence, job))
+            # Saved before a worker can take it, so this row never overwrites a later state
+            self._save(job)
+            self._condition.notify()
+        return job
+
+    def get(self, job_id):
+        """The job with this id, or None if it is unknown or its result expired"""
+        with self._condition:
+            self._expire()
+            job = self._jobs.get(job_id)
+        return job if job is not None else self._load(job_id)
+
+    def position(self, job):
+        """Jobs that will start before a queued job, or None once it has started"""
+        with self._condition:
+            if job.status != "queued" or job.sequence is None:
+                return None
+            return sum(1 for lane, sequence, _ in self._heap if (lane, sequence) < (job.lane, job.sequence))
+
+    def stats(self):
+        with self._condition:
+            by_status = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+            return {
+                "workers": self.workers,
+                "maxQueued": self.max_queued,
+                "queued": len(self._heap),
+                "jobs": by_status,
+            }
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                _, _, job = heapq.heappop(self._heap)
+                job.status = "running"
+                job.started_at = time.time()
+            JOB_WAIT_SECONDS.observe(job.started_at - job.created_at, lane=str(job.lane))
+            self._save(job)
+
+            try:
+                result, status, error = self.process_fn(job.payload), "completed", None
+            except Exception as e:
+                result, status, error = None, "failed", str(e)
+
+            with self._condition:
+                job.result, job.status, job.error = result, status, error
+                job.finished_at = time.time()
+                job.payload = None  # the ticket is no longer needed once processed
+                self._finished.append(job)
+                seconds = job.finished_at - job.started_at
+                self._average_seconds = seconds if self._average_seconds is None else (
+                    0.8 * self._average_seconds + 0.2 * seconds
+                )
+            JOBS.inc(status=status)
+            self._save(job, expire=True)
+
+    def _retry_after(self):
+        # Time for the workers to drain the queue at the recent job duration, at least a second
+        average = self._average_seconds or 1.0
+        return max(1, math.ceil(len(self._heap) * average / self.workers))
+
+    def _expire(self):
+        cutoff = time.time() - self.result_ttl
+        while self._finished and self._finished[0].finished_at < cutoff:
+            del self._jobs[self._finished.popleft().id]
+
+    def _save(self, job, expire=False):
+        if self._db is None:
+            return
+        row = (
+            job.id, job.status, job.lane, job.created_at, job.started_at, job.finished_at,
+            json.dumps(job.result) if job.result is not None else None, job.error,
+        )
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+            if expire:
+                self._db.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - self.result_ttl,))
+            self._db.commit()
+
+    def _load(self, job_id):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT id, status, lane, created_at, started_at, finished_at, result, error FROM jobs "
+                "WHERE id = ? AND (finished_at IS NULL OR finished_at >= ?)",
+                (job_id, time.time() - self.result_ttl)
+            ).fetchone()
+        return Job.from_row(row) if row is not None else None
@@ -0,0 +1,146 @@
+"""
+LLM Response Cache
+------------------
+Content-addressed cache for agent responses, keyed on (backend, model, prompt hash).
+Entries live in an in-memory LRU with a size and TTL limit and can optionally be
+persisted to SQLite so they survive restarts.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import hashlib
+from collections import OrderedDict
+from metrics import record_cache
+
+class ResponseCache:
+    def __init__(self, max_entries=1024, ttl=86400, db_path=None):
+        """Create the cache; db_path enables the on-disk store"""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._entries = OrderedDict()  # key -> (expires_at, serialized response)
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        self._db = None
+        if db_path:
+            self._db = self._connect(db_path)
+
+    def reopen(self):
+        """Replace the database connection, in a process forked after the cache was created"""
+        if self.db_path:
+            with self._lock:
+                self._db = self._connect(self.db_path)
+
+    @staticmethod
+    def make_key(backend, model, prompt):
+        """Hash the prompt together with the backend and model that answer it"""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{backend}:{model}:{digest}"
+
+    def get(self, key):
+        """Return a fresh copy of the cached response, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._entries.move_to_end(key)
+                    return json.loads(entry[1])
+                del self._entries[key]
+
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT expires_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] < now:
+                return None
+            self._remember(key, row[0], row[1])
+            return json.loads(row[1])
+
+    def set(self, key, value):
+        serialized = json.dumps(value)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, serialized)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+                    (key, expires_at, serialized)
+                )
+                self._db.commit()
+
+    def get_or_call(self, backend, model, prompt, agent_fn, bypass=False):
+        """Answer from the cache, or call the agent and cache a successful response"""
+        if bypass:
+            self._count("bypassed")
+            record_cache("bypass")
+            return agent_fn(prompt)
+
+        key, cached = self._lookup(backend, model, prompt)
+        if cached is not None:
+            return cached
+        return self._store(key, agent_fn(prompt))
+
+    async def get_or_call_async(self, backend, model, prompt, agent_fn, bypass=False):
+        """get_or_call for async agent functions"""
+        if bypass:
+            self._count("bypassed")
+            record_cache("bypass")
+            return await agent_fn(prompt)
+
+        key, cached = self._lookup(backend, model, prompt)
+        if cached is not None:
+            return cached
+        return self._store(key, await agent_fn(prompt))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "persistent": self._db is not None
+            }
+
+    @staticmethod
+    def _connect(db_path):
+        # Server workers share the file; WAL lets them read while one of them writes
+        db = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        db.commit()
+        return db
+
+    def _lookup(self, backend, model, prompt):
+        key = self.make_key(backend, model, prompt)
+        cached = self.get(key)
+        self._count("hits" if cached is not None else "misses")
+        record_cache("hit" if cached is not None else "miss")
+        return key, cached
+
+    def _store(self, key, result):
+        # Never cache failures, so the next request gets a real retry
+        if not (isinstance(result, dict) and "error" in result):
+            self.set(key, result)
+        return result
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _remember(self, key, expires_at, serialized):
+        self._entries[key] = (expires_at, serialized)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,233 @@
+"""
+Metrics
+-------
+Counters and histograms for the agent calls, rendered in the Prometheus text
+format by /metrics. Each agent call gets a CallRecord that the code making the
+call fills in (token counts from the LLM response, whether the cache answered),
+and AgentPool observes it into the metrics below when the call finishes.
+"""
+
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; LLM calls range from cache hits to multi-minute local generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labels, key, [("le", repr(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+AGENT_LABELS = ("agent", "backend")
+AGENT_CALL_SECONDS = REGISTRY.register(Histogram(
+    "agent_call_seconds", "Wall time of an agent call, from the start of the call to its result", AGENT_LABELS))
+AGENT_QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "agent_queue_seconds", "Time an agent call waited for a worker and a backend slot", AGENT_LABELS))
+AGENT_CALLS = REGISTRY.register(Counter(
+    "agent_calls_total", "Agent calls by how the response cache answered them (hit, miss, bypass, off)",
+    AGENT_LABELS + ("cache",)))
+AGENT_ERRORS = REGISTRY.register(Counter(
+    "agent_errors_total", "Agent calls that returned an error", AGENT_LABELS))
+AGENT_TIMEOUTS = REGISTRY.register(Counter(
+    "agent_timeouts_total", "Agent calls that missed their request's deadline", AGENT_LABELS))
+AGENT_PROMPT_TOKENS = REGISTRY.register(Counter(
+    "agent_prompt_tokens_total", "Prompt tokens evaluated by the model", AGENT_LABELS))
+AGENT_COMPLETION_TOKENS = REGISTRY.register(Counter(
+    "agent_completion_tokens_total", "Tokens generated by the model", AGENT_LABELS))
+
+JOBS = REGISTRY.register(Counter(
+    "jobs_total", "Queued ticket jobs by outcome (completed, failed, rejected)", ("status",)))
+JOB_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "job_wait_seconds", "Time a job waited in the queue before a worker took it", ("lane",)))
+
+COALESCED_CALLS = REGISTRY.register(Counter(
+    "coalesced_calls_total", "Calls answered by joining an identical call already in flight", ("operation",)))
+
+
+_observe_lock = threading.Lock()
+
+
+class CallRecord:
+    """Measurements of one agent call"""
+
+    __slots__ = ("agent", "backend", "queue_seconds", "wall_seconds", "prompt_tokens", "completion_tokens",
+                 "cache", "error", "timed_out", "submitted", "started", "observed")
+
+    def __init__(self, agent, backend):
+        self.agent = agent
+        self.backend = backend
+        self.queue_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache = "off"
+        self.error = False
+        self.timed_out = False
+        self.submitted = None  # time.perf_counter() values
+        self.started = None
+        self.observed = False
+
+    def observe(self):
+        """Add this call to the process-wide metrics, once"""
+        with _observe_lock:
+            if self.observed:
+                return
+            self.observed = True
+        labels = {"agent": self.agent, "backend": self.backend}
+        AGENT_QUEUE_SECONDS.observe(self.queue_seconds, **labels)
+        AGENT_CALL_SECONDS.observe(self.wall_seconds, **labels)
+        AGENT_CALLS.inc(cache=self.cache, **labels)
+        if self.error:
+            AGENT_ERRORS.inc(**labels)
+        if self.timed_out:
+            AGENT_TIMEOUTS.inc(**labels)
+        if self.prompt_tokens:
+            AGENT_PROMPT_TOKENS.inc(self.prompt_tokens, **labels)
+        if self.completion_tokens:
+            AGENT_COMPLETION_TOKENS.inc(self.completion_tokens, **labels)
+
+    def timing(self):
+        """Entry of the /process-ticket timings block"""
+        return {
+            "queueMs": round(self.queue_seconds * 1000, 1),
+            "wallMs": round(self.wall_seconds * 1000, 1),
+            "promptTokens": self.prompt_tokens,
+            "completionTokens": self.completion_tokens,
+            "cache": self.cache,
+            "error": self.error,
+            "timedOut": self.timed_out,
+        }
+
+
+# The call being made on this thread (or asyncio task), and the request collecting its calls
+_current_call = contextvars.ContextVar("current_call", default=None)
+_collector = contextvars.ContextVar("call_collector", default=None)
+
+
+@contextmanager
+def call_context(record):
+    """Make record the current call while the agent function runs"""
+    token = _current_call.set(record)
+    try:
+        yield record
+    finally:
+        _current_call.reset(token)
+
+
+def record_tokens(prompt_tokens, completion_tokens):
+    """Attach the token counts an LLM reported to the current call, if any"""
+    record = _current_call.get()
+    if record is not None:
+        record.prompt_tokens += prompt_tokens or 0
+        record.completion_tokens += completion_tokens or 0
+
+
+def record_cache(outcome):
+    """Note how the response cache handled the current call"""
+    record = _current_call.get()
+    if record is not None:
+        record.cache = outcome
+
+
+@contextmanager
+def collect_calls():
+    """Collect the CallRecords of agent calls submitted from this block"""
+    calls = []
+    token = _collector.set(calls)
+    try:
+        yield calls
+    finally:
+        _collector.reset(token)
+
+
+def active_collector():
+    """List that calls submitted now should be added to, or None"""
+    return _collector.get()
+
+
+def render():
+    return REGISTRY.render()
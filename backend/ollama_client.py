@@ -0,0 +1,296 @@
+"""
+Ollama Client
+-------------
+Shared HTTP client for the Ollama API. Connections are pooled and kept alive
+between calls, and every request carries a connect/read timeout, cut short by
+the deadline of the request the call is made for. Generations ask
+Ollama to keep the model loaded for OLLAMA_KEEP_ALIVE, so it is not unloaded
+(with its prompt cache) between tickets.
+
+OllamaPool spreads generations over several Ollama nodes. A background thread
+probes every node's /api/tags; each call goes to the healthy node with the
+requested model that has the fewest calls in flight, and moves on to the next
+node when a node cannot be reached or answers with a server error.
+"""
+
+import os
+import json
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from deadline import DeadlineExceeded, bounded, expired
+
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", "300"))
+OLLAMA_POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "16"))
+# Duration such as "30m", or seconds; -1 keeps the model loaded indefinitely, empty leaves Ollama's default
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_HEALTH_INTERVAL = float(os.environ.get("OLLAMA_HEALTH_INTERVAL", "10"))  # seconds between node probes
+
+
+def keep_alive_value(setting):
+    """Ollama reads bare numbers as seconds but strings only as durations with a unit"""
+    try:
+        return int(setting)
+    except ValueError:
+        return setting or None
+
+class OllamaError(Exception):
+    """Raised when Ollama reports an error partway through a streamed generation"""
+
+
+class OllamaClient:
+    def __init__(self, base_url, connect_timeout=OLLAMA_CONNECT_TIMEOUT,
+                 read_timeout=OLLAMA_READ_TIMEOUT, pool_size=OLLAMA_POOL_SIZE, keep_alive=OLLAMA_KEEP_ALIVE):
+        """Create a keep-alive session whose pool holds up to pool_size connections"""
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive_value(keep_alive)
+        self.session = requests.Session()
+        # Block for a free connection instead of opening throwaway ones past the pool size
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def generate(self, model, prompt, system=None, stream=False, **options):
+        """POST to /api/generate and return the raw response"""
+        payload = {"model": model, "prompt": prompt, "stream": stream}
+        if system:
+            payload["system"] = system
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        payload.update(options)
+        read_timeout = bounded(self.read_timeout)
+        return self.session.post(
+            f"{self.base_url}/api/generate",
+            json=payload,
+            stream=stream,
+            timeout=(min(self.connect_timeout, read_timeout), read_timeout)
+        )
+
+    def generate_stream(self, model, prompt, system=None, **options):
+        """Stream /api/generate, yielding each decoded chunk until the model is done"""
+        with self.generate(model, prompt, system=system, stream=True, **options) as response:
+            if response.status_code != 200:
+                raise OllamaError(f"Ollama API returned status code {response.status_code}")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(chunk["error"])
+                yield chunk
+                if chunk.get("done"):
+                    return
+                if expired():
+                    # Closing the response makes Ollama stop generating
+                    raise DeadlineExceeded("The request deadline passed during generation")
+
+    def tags(self):
+        """GET /api/tags, which lists the installed models"""
+        return self.session.get(
+            f"{self.base_url}/api/tags",
+            timeout=(self.connect_timeout, self.connect_timeout)
+        )
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(base_url, pool_size=OLLAMA_POOL_SIZE):
+    """Return the process-wide client for an Ollama base URL"""
+    key = base_url.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OllamaClient(key, pool_size=pool_size)
+            _clients[key] = client
+        return client
+
+
+def model_name(name):
+    """Model name as requested, without the ":latest" tag Ollama lists it with"""
+    return name[:-len(":latest")] if name.endswith(":latest") else name
+
+
+class OllamaNode:
+    def __init__(self, client):
+        self.client = client
+        self.healthy = True  # until a probe or a call says otherwise
+        self.models = None  # model names from the last successful probe; None until then
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_checked = None
+
+    def serves(self, model):
+        return self.models is None or model_name(model) in self.models
+
+    def to_dict(self):
+        return {
+            "url": self.client.base_url,
+            "healthy": self.healthy,
+            "inFlight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "models": sorted(self.models) if self.models is not None else None,
+            "lastError": self.last_error,
+            "lastChecked": self.last_checked,
+        }
+
+
+class OllamaPool:
+    def __init__(self, base_urls, health_interval=OLLAMA_HEALTH_INTERVAL, max_concurrency=None):
+        """Route calls over the Ollama nodes at base_urls, probing them every health_interval seconds
+
+        A connection pool waits for a free connection without a timeout, so each
+        node's pool gets room for max_concurrency calls (any one node may take
+        them all when the others are down) and a health probe.
+        """
+        pool_size = OLLAMA_POOL_SIZE if max_concurrency is None else max(OLLAMA_POOL_SIZE, max_concurrency + 1)
+        self.nodes = [OllamaNode(get_client(url, pool_size)) for url in base_urls]
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._checker = None
+
+    def start_health_checks(self):
+        """Start the probe thread; left to the caller so a pre-fork server starts it in each worker"""
+        if self.health_interval <= 0 or self._checker is not None:
+            return
+        self._checker = threading.Thread(target=self._check_forever, name="ollama-health", daemon=True)
+        self._checker.start()
+
+    def generate(self, model, prompt, system=None, **options):
+        """POST /api/generate to the least-loaded node, failing over to the others"""
+        error, last_response = None, None
+        for node in self._candidates(model):
+            try:
+                response = node.client.generate(model, prompt, system=system, **options)
+            except requests.exceptions.ConnectionError as e:
+                error = e
+                self._failed(node, str(e), reachable=False)
+                continue
+            finally:
+                self._release(node)
+            if response.status_code < 500 and response.status_code != 404:
+                return response
+            error, last_response = None, response
+            self._failed(node, f"status code {response.status_code}", missing_model=response.status_code == 404, model=model)
+        if error is not None:
+            raise error
+        return last_response
+
+    def generate_stream(self, model, prompt, system=None, **options):
+        """Stream /api/generate from the least-loaded node; fails over only before the first chunk"""
+        error = None
+        for node in self._candidates(model):
+            started = False
+            try:
+                for chunk in node.client.generate_stream(model, prompt, system=system, **options):
+                    started = True
+                    yield chunk
+                return
+            except (requests.exceptions.ConnectionError, OllamaError) as e:
+                if started:
+                    raise
+                error = e
+                reachable = not isinstance(e, requests.exceptions.ConnectionError)
+                self._failed(node, str(e), reachable=reachable)
+            finally:
+                self._release(node)
+        raise error
+
+    def tags(self):
+        """GET /api/tags from a healthy node, trying the others if it fails"""
+        error, last_response = None, None
+        for node in self._by_load():
+            try:
+                response = node.client.tags()
+            except requests.exceptions.RequestException as e:
+                error = e
+                continue
+            if response.status_code == 200:
+                return response
+            error, last_response = None, response
+        if error is not None:
+            raise error
+        return last_response
+
+    def stats(self):
+        with self._lock:
+            return [node.to_dict() for node in self.nodes]
+
+    def close(self):
+        for node in self.nodes:
+            node.client.close()
+
+    def _candidates(self, model):
+        """Nodes to try in turn, each one claimed (counted in flight) just before it is yielded"""
+        tried = set()
+        while True:
+            with self._lock:
+                node = self._least_loaded(model, tried)
+                if node is None:
+                    return
+                tried.add(node)
+                node.in_flight += 1
+                node.requests += 1
+            yield node
+
+    def _least_loaded(self, model, exclude):
+        # Prefer healthy nodes with the model; otherwise let any node answer, if only with the error
+        for usable in (lambda node: node.healthy and node.serves(model), lambda node: node.serves(model),
+                       lambda node: True):
+            nodes = [node for node in self.nodes if node not in exclude and usable(node)]
+            if nodes:
+                return min(nodes, key=lambda node: node.in_flight)
+        return None
+
+    def _by_load(self):
+        with self._lock:
+            healthy = sorted((node for node in self.nodes if node.healthy), key=lambda node: node.in_flight)
+            return healthy + [node for node in self.nodes if not node.healthy]
+
+    def _release(self, node):
+        with self._lock:
+            node.in_flight -= 1
+
+    def _failed(self, node, error, reachable=True, missing_model=False, model=None):
+        with self._lock:
+            node.failures += 1
+            node.last_error = error
+            if not reachable:
+                node.healthy = False  # until the next probe succeeds
+            if missing_model and node.models is not None:
+                node.models.discard(model_name(model))
+        print(f"Ollama node {node.client.base_url} failed: {error}")
+
+    def _check_forever(self):
+        while True:
+            for node in self.nodes:
+                self._check(node)
+            time.sleep(self.health_interval)
+
+    def _check(self, node):
+        try:
+            response = node.client.tags()
+            healthy = response.status_code == 200
+            models = {model_name(model["name"]) for model in response.json().get("models", [])} if healthy else None
+            error = None if healthy else f"status code {response.status_code}"
+        except (requests.exceptions.RequestException, ValueError) as e:
+            healthy, models, error = False, None, str(e)
+        with self._lock:
+            if healthy != node.healthy:
+                print(f"Ollama node {node.client.base_url} is {'healthy' if healthy else 'unhealthy'}")
+            node.healthy = healthy
+            if models is not None:
+                node.models = models
+            if error is not None:
+                node.last_error = error
+            node.last_checked = time.time()
@@ -0,0 +1,100 @@
+"""
+Retrieval Index
+---------------
+Token inverted index with BM25 scoring, used to rank the historical cases and
+conversations most relevant to a ticket without scanning every document.
+"""
+
+import re
+import math
+import copy
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could did do does for from had has have how
+i if in into is it its me my no not of on or our so than that the their them then
+there these they this to too up us was we were what when where which who why will
+with would you your yet just also any all after before again very please
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens, without stopwords and one or two letter fragments"""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 2 and token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # token -> (array of doc ids, array of term frequencies)
+        self.doc_lengths = array("I")
+        self.doc_count = 0
+        self.total_length = 0
+
+    def __len__(self):
+        return self.doc_count
+
+    def fork(self):
+        """Index sharing these postings that can grow without changing this one's results
+
+        Documents added to the fork get ids past this index's doc_count, which
+        searches here skip, so readers of the original keep a consistent view.
+        """
+        return copy.copy(self)
+
+    def add(self, tokens):
+        """Index a tokenized document and return its id"""
+        doc_id = self.doc_count
+        for token, tf in Counter(tokens).items():
+            entry = self.postings.get(token)
+            if entry is None:
+                entry = (array("I"), array("I"))
+                self.postings[token] = entry
+            entry[0].append(doc_id)
+            entry[1].append(tf)
+        self.doc_lengths.append(len(tokens))
+        self.doc_count += 1
+        self.total_length += len(tokens)
+        return doc_id
+
+    def search(self, query, k=3):
+        """Return up to k (doc id, score) pairs, best first
+
+        Only the postings of the query's tokens are visited, so the cost depends
+        on how common those tokens are rather than on the size of the index.
+        """
+        doc_count = self.doc_count
+        if doc_count == 0:
+            return []
+        avg_length = self.total_length / doc_count or 1.0
+
+        scores = {}
+        for token in set(tokenize(query)):
+            entry = self._postings(token)
+            if entry is None:
+                continue
+            doc_ids, tfs = entry
+            # Postings are in doc id order; ids past doc_count belong to a newer fork
+            df = bisect_left(doc_ids, doc_count)
+            if df == 0:
+                continue
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for doc_id, tf in zip(doc_ids[:df], tfs[:df]):
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        # Ties go to the earlier document so results stay stable
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+    def _postings(self, token):
+        """(doc ids, term frequencies) for a token, or None"""
+        return self.postings.get(token)
@@ -0,0 +1,68 @@
+"""
+Single Flight
+-------------
+Deduplicates concurrent calls with the same key: the first caller runs the
+function and callers that arrive while it is in flight wait for it and share
+its result (or its exception). Nothing is kept once the call finishes, so this
+only merges simultaneous work; the response cache covers repeats over time.
+"""
+
+import threading
+from metrics import COALESCED_CALLS
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self, operation):
+        """operation names the deduplicated calls in the coalesced-calls metric"""
+        self.operation = operation
+        self.coalesced = 0
+        self._calls = {}  # key -> _Call in flight
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout=None):
+        """Return (fn(), shared); shared is True when another caller's result was reused
+
+        A caller that joins a call in flight waits at most timeout seconds for it,
+        then raises TimeoutError; the call itself carries on for its other callers.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            COALESCED_CALLS.inc(operation=self.operation)
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"{self.operation} did not finish within {timeout:.1f} seconds")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "inFlight": len(self._calls),
+                "waiting": sum(call.waiters for call in self._calls.values()),
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,258 @@
+"""
+Dataset Snapshot
+----------------
+Compiled, memory-mapped snapshot of everything DataLoader derives from the data
+directory: the TicketStore columns, the conversation list and the prebuilt
+retrieval and filter indexes. Loading it maps the file and wraps its sections
+in zero-copy arrays, so startup no longer scales with the size of the CSV.
+
+Layout: MAGIC, a little-endian uint64 header length, a JSON header (source
+fingerprints and a table of sections), then the sections, each 8-byte aligned.
+"""
+
+import os
+import sys
+import json
+import mmap
+import heapq
+import struct
+import hashlib
+from array import array
+from bisect import bisect_left
+from retrieval import BM25Index
+from ticket_store import CategoricalColumn, StringColumn, TicketStore
+
+MAGIC = b"TKSNAP01"
+FORMAT_VERSION = 2
+_ALIGN = 8
+
+
+class FrozenBM25Index(BM25Index):
+    """BM25Index over postings read from a snapshot; terms are found by binary search"""
+
+    def __init__(self, vocabulary, term_offsets, doc_ids, tfs, doc_lengths, total_length):
+        super().__init__()
+        self.vocabulary = vocabulary  # sorted StringColumn
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.doc_count = len(doc_lengths)
+        self.total_length = total_length
+
+    def add(self, tokens):
+        raise TypeError("A snapshot index is read-only; fork it to add documents")
+
+    def fork(self):
+        """Growable BM25Index holding a copy of these postings"""
+        index = BM25Index(self.k1, self.b)
+        for i, token in enumerate(self.vocabulary):
+            start, end = self.term_offsets[i], self.term_offsets[i + 1]
+            index.postings[token] = (array("I", self.doc_ids[start:end]), array("I", self.tfs[start:end]))
+        index.doc_lengths = array("I", self.doc_lengths)
+        index.doc_count = self.doc_count
+        index.total_length = self.total_length
+        return index
+
+    def _postings(self, token):
+        i = bisect_left(self.vocabulary, token)
+        if i == len(self.vocabulary) or self.vocabulary[i] != token:
+            return None
+        start, end = self.term_offsets[i], self.term_offsets[i + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+
+def fingerprint_sources(paths, with_hashes=False):
+    """Size, mtime and (optionally) content hash of every source file"""
+    sources = {}
+    for name, path in paths.items():
+        stat = os.stat(path)
+        sources[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if with_hashes:
+            sources[name]["sha256"] = _hash_file(path)
+    return sources
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_snapshot(path, source_paths, view):
+    """Compile a DataView into a snapshot file, replacing any previous one"""
+    sections = {}
+
+    def put(name, data):
+        sections[name] = data
+
+    def put_strings(name, strings):
+        column = strings if isinstance(strings, StringColumn) else StringColumn.from_strings(strings)
+        put(f"{name}.offsets", array("Q", column.offsets))
+        put(f"{name}.blob", bytes(column.blob))
+
+    # Ticket columns, exactly as the store holds them
+    columns = []
+    for column_name, column in view.historical_tickets.columns.items():
+        if isinstance(column, CategoricalColumn):
+            put_strings(f"column.{column_name}.values", column.values)
+            put(f"column.{column_name}.codes", array("I", column.codes))
+            columns.append([column_name, "categorical"])
+        else:
+            put_strings(f"column.{column_name}.text", column)
+            columns.append([column_name, "text"])
+
+    # Retrieval indexes
+    for name, index in (("ticket_index", view.ticket_index), ("conversation_index", view.conversation_index)):
+        if isinstance(index, FrozenBM25Index):
+            index = index.fork()
+        vocabulary = sorted(index.postings)
+        term_offsets = array("Q", [0])
+        doc_ids = array("I")
+        tfs = array("I")
+        for token in vocabulary:
+            token_docs, token_tfs = index.postings[token]
+            doc_ids.extend(token_docs)
+            tfs.extend(token_tfs)
+            term_offsets.append(len(doc_ids))
+        put_strings(f"{name}.vocabulary", vocabulary)
+        put(f"{name}.term_offsets", term_offsets)
+        put(f"{name}.doc_ids", doc_ids)
+        put(f"{name}.tfs", tfs)
+        put(f"{name}.doc_lengths", array("I", index.doc_lengths))
+
+    # Filter indexes and date order
+    for field, by_value in view.field_index.items():
+        offsets = array("Q", [0])
+        positions = array("I")
+        for value_positions in by_value.values():
+            positions.extend(value_positions)
+            offsets.append(len(positions))
+        put_strings(f"field.{field}.values", list(by_value))
+        put(f"field.{field}.offsets", offsets)
+        put(f"field.{field}.positions", positions)
+    dated = list(heapq.merge(*(zip(dates, positions) for dates, positions in view.date_runs)))
+    put_strings("dates", [date for date, _ in dated])
+    put("date_positions", array("I", [position for _, position in dated]))
+
+    put_strings("conversation_names", list(view.conversation_names))
+
+    header = {
+        "format": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "sources": fingerprint_sources(source_paths, with_hashes=True),
+        "columns": columns,
+        "fields": list(view.field_index),
+        "total_lengths": {
+            "ticket_index": view.ticket_index.total_length,
+            "conversation_index": view.conversation_index.total_length,
+        },
+        "sections": {},
+    }
+
+    # Lay the sections out after the header; offsets are relative to the data start
+    offset = 0
+    for name, data in sections.items():
+        typecode = data.typecode if isinstance(data, array) else "B"
+        length = len(data) * data.itemsize if isinstance(data, array) else len(data)
+        header["sections"][name] = [offset, length, typecode]
+        offset += length + (-length % _ALIGN)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-(len(MAGIC) + 8 + len(header_bytes)) % _ALIGN)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<Q", len(header_bytes)))
+        file.write(header_bytes)
+        for data in sections.values():
+            raw = data.tobytes() if isinstance(data, array) else data
+            file.write(raw)
+            file.write(b"\0" * (-len(raw) % _ALIGN))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path, source_paths):
+    """Map a snapshot and return the DataView fields it holds, or None if stale"""
+    try:
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                return None
+            (header_length,) = struct.unpack("<Q", file.read(8))
+            header = json.loads(file.read(header_length))
+            if header.get("format") != FORMAT_VERSION or header.get("byteorder") != sys.byteorder:
+                return None
+            if not _sources_match(header["sources"], source_paths):
+                return None
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    data_start = len(MAGIC) + 8 + header_length
+    view = memoryview(buffer)
+
+    def section(name):
+        offset, length, typecode = header["sections"][name]
+        raw = view[data_start + offset:data_start + offset + length]
+        return raw if typecode == "B" else raw.cast(typecode)
+
+    def strings(name):
+        return StringColumn(section(f"{name}.offsets"), section(f"{name}.blob"))
+
+    columns = {}
+    for column_name, kind in header["columns"]:
+        if kind == "categorical":
+            columns[column_name] = CategoricalColumn(
+                list(strings(f"column.{column_name}.values")),
+                section(f"column.{column_name}.codes")
+            )
+        else:
+            columns[column_name] = strings(f"column.{column_name}.text")
+
+    def index(name):
+        return FrozenBM25Index(
+            strings(f"{name}.vocabulary"),
+            section(f"{name}.term_offsets"),
+            section(f"{name}.doc_ids"),
+            section(f"{name}.tfs"),
+            section(f"{name}.doc_lengths"),
+            header["total_lengths"][name],
+        )
+
+    field_index = {}
+    for field in header["fields"]:
+        offsets = section(f"field.{field}.offsets")
+        positions = section(f"field.{field}.positions")
+        field_index[field] = {
+            value: positions[offsets[i]:offsets[i + 1]]
+            for i, value in enumerate(strings(f"field.{field}.values"))
+        }
+
+    return {
+        "buffer": buffer,
+        "sources": header["sources"],
+        "historical_tickets": TicketStore(columns),
+        "ticket_index": index("ticket_index"),
+        "conversation_index": index("conversation_index"),
+        "conversation_names": list(strings("conversation_names")),
+        "field_index": field_index,
+        "date_runs": [(strings("dates"), section("date_positions"))],
+    }
+
+
+def _sources_match(recorded, source_paths):
+    if set(recorded) != set(source_paths):
+        return False
+    current = fingerprint_sources(source_paths)
+    for name, stat in current.items():
+        saved = recorded[name]
+        if saved["size"] != stat["size"]:
+            return False
+        # Touched but possibly unchanged: fall back to comparing content hashes
+        if saved["mtime_ns"] != stat["mtime_ns"] and saved.get("sha256") != _hash_file(source_paths[name]):
+            return False
+    return True
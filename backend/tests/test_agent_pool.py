@@ -0,0 +1,107 @@
+import time
+import threading
+from agent_pool import AgentPool
+from deadline import after, deadline_scope
+from metrics import collect_calls
+
+
+def test_run_all_collects_results_by_name():
+    pool = AgentPool(4, {"test": 4})
+    results = pool.run_all("test", lambda prompt: {"echo": prompt}, {"summary": "a", "routing": "b"})
+    assert results == {"summary": {"echo": "a"}, "routing": {"echo": "b"}}
+
+
+def test_run_all_turns_exceptions_into_error_results():
+    def agent(prompt):
+        raise RuntimeError("backend down")
+
+    results = AgentPool(2, {}).run_all("test", agent, {"summary": "a"})
+    assert results == {"summary": {"error": "backend down"}}
+
+
+def test_backend_limit_caps_calls_in_flight():
+    pool = AgentPool(8, {"test": 2})
+    lock = threading.Lock()
+    running = peak = 0
+
+    def agent(prompt):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return {}
+
+    pool.run_all("test", agent, {str(i): "prompt" for i in range(8)})
+    assert peak == 2
+
+
+def prompt_for(name, upstream):
+    return f"{name} after {','.join(sorted(upstream))}"
+
+
+def test_run_graph_passes_upstream_results_in_dependency_order():
+    pool = AgentPool(4, {"test": 4})
+    finished = []
+
+    def agent(prompt):
+        finished.append(prompt.split()[0])
+        return {"prompt": prompt}
+
+    results = pool.run_graph("test", agent, ["routing", "summary", "timeEstimation"],
+                             {"timeEstimation": ("routing",)}, prompt_for)
+    assert list(results) == ["routing", "summary", "timeEstimation"]
+    assert results["timeEstimation"]["prompt"] == "timeEstimation after routing"
+    assert results["summary"]["prompt"] == "summary after "
+    assert finished.index("routing") < finished.index("timeEstimation")
+
+
+def test_run_graph_runs_without_dependencies_that_were_not_requested():
+    pool = AgentPool(2, {})
+    results = pool.run_graph("test", lambda prompt: {"prompt": prompt}, ["timeEstimation"],
+                             {"timeEstimation": ("routing",)}, prompt_for)
+    assert results == {"timeEstimation": {"prompt": "timeEstimation after "}}
+
+
+def test_run_graph_reports_agents_past_the_deadline_as_timed_out():
+    pool = AgentPool(2, {})
+    release = threading.Event()
+
+    def agent(prompt):
+        if prompt.startswith("slow"):
+            release.wait(2)
+        return {"prompt": prompt}
+
+    try:
+        with deadline_scope(after(200)):
+            started = time.monotonic()
+            results = pool.run_graph("test", agent, ["fast", "slow"], {}, prompt_for)
+        assert time.monotonic() - started < 1
+        assert results["fast"] == {"prompt": "fast after "}
+        assert results["slow"] == {"timedOut": True}
+    finally:
+        release.set()
+
+
+def test_timed_out_calls_are_recorded_when_the_deadline_passes():
+    pool = AgentPool(1, {"test": 1})
+    release = threading.Event()
+
+    def agent(prompt):
+        release.wait(2)
+        return {}
+
+    try:
+        with collect_calls() as calls, deadline_scope(after(200)):
+            # routing runs, summary waits for the only worker, timeEstimation waits for routing
+            results = pool.run_graph("test", agent, ["routing", "summary", "timeEstimation"],
+                                     {"timeEstimation": ("routing",)}, prompt_for)
+        timings = {call.agent: call.timing() for call in calls}
+        assert sorted(timings) == sorted(results)
+        assert all(timing["timedOut"] and not timing["error"] for timing in timings.values())
+        assert timings["routing"]["wallMs"] >= 150
+        assert timings["summary"]["queueMs"] >= 150
+    finally:
+        release.set()
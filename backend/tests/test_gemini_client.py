@@ -0,0 +1,89 @@
+import time
+import asyncio
+import types
+import pytest
+from google.api_core import exceptions as google_exceptions
+import gemini_client
+from deadline import DeadlineExceeded, after, deadline_scope
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel; each call takes the next outcome"""
+
+    def __init__(self, outcomes, delay=0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.timeouts = []
+
+    def _next(self, request_options):
+        self.timeouts.append(request_options["timeout"])
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return types.SimpleNamespace(text=outcome, usage_metadata=None)
+
+    def generate_content(self, prompt, request_options):
+        time.sleep(self.delay)
+        return self._next(request_options)
+
+    async def generate_content_async(self, prompt, request_options):
+        await asyncio.sleep(self.delay)
+        return self._next(request_options)
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    def make(outcomes, delay=0, **options):
+        model = FakeModel(outcomes, delay)
+        monkeypatch.setattr(gemini_client, "genai", types.SimpleNamespace(
+            configure=lambda api_key: None, GenerativeModel=lambda name: model))
+        return gemini_client.GeminiClient("key", **options), model
+    return make
+
+
+def rate_limited():
+    return google_exceptions.ResourceExhausted("quota exceeded")
+
+
+def test_generate_retries_when_rate_limited(make_client):
+    client, model = make_client([rate_limited(), rate_limited(), "ok"], backoff=0.001)
+    assert client.generate("prompt") == "ok"
+    assert len(model.timeouts) == 3
+
+
+def test_generate_gives_up_after_max_retries(make_client):
+    client, model = make_client([rate_limited()] * 3, backoff=0.001, max_retries=2)
+    with pytest.raises(google_exceptions.ResourceExhausted):
+        client.generate("prompt")
+    assert len(model.timeouts) == 3
+
+
+def test_generate_does_not_back_off_past_the_deadline(make_client):
+    client, model = make_client([rate_limited(), "ok"], backoff=1.0)
+    with deadline_scope(after(200)):
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            client.generate("prompt")
+    assert time.monotonic() - started < 0.5
+    assert len(model.timeouts) == 1
+
+
+def test_generate_timeout_is_cut_to_the_deadline(make_client):
+    client, model = make_client(["ok"], timeout=60)
+    with deadline_scope(after(500)):
+        client.generate("prompt")
+    assert model.timeouts[0] <= 0.5
+
+
+def test_generate_async_times_out(make_client):
+    client, _ = make_client(["late"], delay=1.0)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        asyncio.run(client.generate_async("prompt", timeout=0.05))
+    assert time.monotonic() - started < 0.5
+
+
+def test_generate_async_retries_when_rate_limited(make_client):
+    client, model = make_client([rate_limited(), "ok"], backoff=0.001)
+    assert asyncio.run(client.generate_async("prompt")) == "ok"
+    assert len(model.timeouts) == 2
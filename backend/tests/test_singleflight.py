@@ -0,0 +1,92 @@
+import time
+import threading
+import pytest
+from singleflight import SingleFlight
+
+
+def start(target, count=1):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 2
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+    outcomes = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return {"answer": 42}
+
+    threads = start(lambda: outcomes.append(flight.do("key", fn)))
+    wait_for(lambda: calls)
+    threads += start(lambda: outcomes.append(flight.do("key", fn)), 4)
+    wait_for(lambda: flight.stats()["waiting"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True, True]
+    assert all(result == {"answer": 42} for result, _ in outcomes)
+    assert flight.stats() == {"inFlight": 0, "waiting": 0, "coalesced": 4}
+
+
+def test_waiters_get_the_exception_of_the_call():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    running = threading.Event()
+    errors = []
+
+    def fn():
+        running.set()
+        release.wait(2)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flight.do("key", fn)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = start(call)
+    running.wait(2)
+    threads += start(call)
+    wait_for(lambda: flight.stats()["waiting"] == 1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+
+
+def test_waiter_times_out_while_the_call_carries_on():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    running = threading.Event()
+    outcomes = []
+
+    def fn():
+        running.set()
+        release.wait(2)
+        return "done"
+
+    threads = start(lambda: outcomes.append(flight.do("key", fn)))
+    running.wait(2)
+    with pytest.raises(TimeoutError):
+        flight.do("key", fn, timeout=0.05)
+    release.set()
+    threads[0].join()
+
+    assert outcomes == [("done", False)]
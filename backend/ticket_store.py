@@ -0,0 +1,181 @@
+"""
+Ticket Store
+------------
+Columnar in-memory table for historical tickets. Low-cardinality columns are
+dictionary-encoded into integer code arrays, free-text columns are packed into a
+single UTF-8 buffer, and rows are exposed through lightweight views that keep
+the dict-style `.get(...)` access the rest of the backend uses.
+"""
+
+from array import array
+
+# Columns with a handful of distinct values, stored as codes into a value list
+CATEGORICAL_COLUMNS = ("Issue Category", "Sentiment", "Priority", "Resolution Status")
+
+
+class StringColumn:
+    """Sequence of strings stored as uint64 offsets into one UTF-8 buffer
+
+    The buffers may be read-only views into a snapshot; they are copied into
+    growable arrays the first time a value is appended.
+    """
+
+    def __init__(self, offsets=None, blob=None):
+        self.offsets = offsets if offsets is not None else array("Q", [0])
+        self.blob = blob if blob is not None else bytearray()
+
+    @classmethod
+    def from_strings(cls, strings):
+        column = cls()
+        for value in strings:
+            column.append(value)
+        return column
+
+    def append(self, value):
+        if not isinstance(self.blob, bytearray):
+            self.offsets = array("Q", self.offsets)
+            self.blob = bytearray(self.blob)
+        self.blob += value.encode("utf-8")
+        self.offsets.append(len(self.blob))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string column index out of range")
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class CategoricalColumn:
+    """Dictionary-encoded column: one integer code per row into a list of distinct values"""
+
+    def __init__(self, values=None, codes=None):
+        self.values = values if values is not None else []
+        self.codes = codes if codes is not None else array("I")
+        self._code_of = None  # value -> code, built on first lookup
+
+    def append(self, value):
+        code = self.code_for(value)
+        if code is None:
+            if not isinstance(self.values, list):
+                self.values = list(self.values)
+            code = len(self.values)
+            self.values.append(value)
+            self._code_of[value] = code
+        if not isinstance(self.codes, array):
+            self.codes = array("I", self.codes)
+        self.codes.append(code)
+
+    def code_for(self, value):
+        """Code of a value, or None if no row has it"""
+        if self._code_of is None:
+            self._code_of = {v: code for code, v in enumerate(self.values)}
+        return self._code_of.get(value)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def __iter__(self):
+        values = self.values
+        for code in self.codes:
+            yield values[code]
+
+
+class TicketRow:
+    """Read-only view of one row, usable wherever a ticket dict was"""
+
+    __slots__ = ("_store", "_position")
+
+    def __init__(self, store, position):
+        self._store = store
+        self._position = position
+
+    def get(self, key, default=None):
+        column = self._store.columns.get(key)
+        return default if column is None else column[self._position]
+
+    def __getitem__(self, key):
+        return self._store.columns[key][self._position]
+
+    def __contains__(self, key):
+        return key in self._store.columns
+
+    def keys(self):
+        return self._store.columns.keys()
+
+    def items(self):
+        return [(name, column[self._position]) for name, column in self._store.columns.items()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __iter__(self):
+        return iter(self._store.columns)
+
+    def __len__(self):
+        return len(self._store.columns)
+
+    def __eq__(self, other):
+        if isinstance(other, (TicketRow, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TicketRow({self.to_dict()!r})"
+
+
+class TicketStore:
+    """Columnar table of tickets; indexing returns TicketRow views"""
+
+    def __init__(self, columns, length=None):
+        """columns maps each column name to a StringColumn or CategoricalColumn
+
+        length limits the store to the first rows of the columns; it defaults to all of them.
+        """
+        self.columns = dict(columns)
+        self.length = length if length is not None else min(map(len, self.columns.values()), default=0)
+
+    @classmethod
+    def empty(cls, column_names, categorical=CATEGORICAL_COLUMNS):
+        return cls({
+            name: CategoricalColumn() if name in categorical else StringColumn()
+            for name in column_names
+        })
+
+    def append(self, values):
+        """Append one row given its values in column order"""
+        for column, value in zip(self.columns.values(), values):
+            column.append(value)
+        self.length += 1
+
+    def fork(self):
+        """Store sharing these columns that can grow without changing this one's length
+
+        Rows appended to the fork land past this store's length, so readers of
+        the original keep seeing the same rows.
+        """
+        return TicketStore(self.columns, self.length)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("ticket index out of range")
+        return TicketRow(self, position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield TicketRow(self, position)